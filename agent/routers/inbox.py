@@ -5,10 +5,12 @@ import shutil
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from shared.schemas import DestinationPath
+
 from ..config import load_config
 from ..db import get_db
 from ..models import InboxTransferItem, LocalShare
@@ -22,7 +24,7 @@ UNKNOWN_SHA256 = "0" * 64
 
 class FinalizeRequest(BaseModel):
     item_id: str
-    destination_path: str = Field(default="", max_length=400)
+    destination_path: DestinationPath = ""
     keep_original_name: bool = True
 
 
@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import mimetypes
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import lru_cache
 import heapq
+from operator import itemgetter
 from pathlib import Path
 from typing import Any
 
@@ -63,31 +65,42 @@ CODE_EXTENSIONS = {
 TEXT_EXTENSIONS = {".txt", ".log", ".text", ".rst", ".asc", ".readme", ".license"}
 LIST_DEFAULT_MAX_ENTRIES = 300
 LIST_MAX_ENTRIES_CAP = 5000
+SEARCH_SCAN_PREFETCH = 8
 
+_search_scan_executor = ThreadPoolExecutor(max_workers=SEARCH_SCAN_PREFETCH, thread_name_prefix="search-scandir")
 
+
+_CODE_FILE_NAMES = {"dockerfile", "makefile", ".env", ".gitignore"}
+# Earlier groups win when an extension appears twice, matching the order get_file_type used to test them in.
+_EXTENSION_TYPES: dict[str, str] = {}
+for _file_type, _extensions in (
+    ("video", VIDEO_EXTENSIONS),
+    ("svg", SVG_EXTENSIONS),
+    ("image", IMAGE_EXTENSIONS),
+    ("pdf", PDF_EXTENSIONS),
+    ("word", WORD_EXTENSIONS),
+    ("excel", EXCEL_EXTENSIONS),
+    ("markdown", MARKDOWN_EXTENSIONS),
+    ("html", HTML_EXTENSIONS),
+    ("code", CODE_EXTENSIONS),
+    ("text", TEXT_EXTENSIONS),
+):
+    for _extension in _extensions:
+        _EXTENSION_TYPES.setdefault(_extension, _file_type)
+del _file_type, _extensions, _extension
+
+
+@lru_cache(maxsize=4096)
 def get_file_type(filename: str | Path) -> str:
-    extension = Path(str(filename)).suffix.lower()
-    base_name = Path(str(filename)).name.lower()
-    if extension in VIDEO_EXTENSIONS:
-        return "video"
-    if extension in SVG_EXTENSIONS:
-        return "svg"
-    if extension in IMAGE_EXTENSIONS:
-        return "image"
-    if extension in PDF_EXTENSIONS:
-        return "pdf"
-    if extension in WORD_EXTENSIONS:
-        return "word"
-    if extension in EXCEL_EXTENSIONS:
-        return "excel"
-    if extension in MARKDOWN_EXTENSIONS:
-        return "markdown"
-    if extension in HTML_EXTENSIONS:
-        return "html"
-    if extension in CODE_EXTENSIONS or base_name in {"dockerfile", "makefile", ".env", ".gitignore"}:
+    base_name = os.path.basename(os.fspath(filename)).lower()
+    # Same rule as PurePath.suffix: a leading dot (".env") or a trailing one ("name.") is not an extension.
+    dot = base_name.rfind(".")
+    extension = base_name[dot:] if 0 < dot < len(base_name) - 1 else ""
+    file_type = _EXTENSION_TYPES.get(extension)
+    if file_type is not None:
+        return file_type
+    if base_name in _CODE_FILE_NAMES:
         return "code"
-    if extension in TEXT_EXTENSIONS:
-        return "text"
     return "other"
 
 
@@ -110,43 +123,85 @@ def resolve_share_path(share_root: Path, raw_path: str | None) -> Path:
     return resolve_requested_path(share_root, raw_path)
 
 
-def _entry_to_item(root_dir: Path, entry_path: Path, is_directory: bool) -> dict[str, Any]:
+def _entry_to_item(
+    root_dir: Path,
+    entry: os.DirEntry[str],
+    is_directory: bool,
+    *,
+    parent_client_path: str | None = None,
+) -> dict[str, Any]:
+    name = entry.name
+    if parent_client_path is None:
+        entry_path = Path(entry.path)
+        client_path = to_client_path(entry_path, root_dir)
+        parent_client_path = to_client_path(entry_path.parent, root_dir)
+    else:
+        # Caller vouches that entry is a non-symlink child of an already resolved directory.
+        client_path = f"{parent_client_path}/{name}" if parent_client_path else name
+
+    try:
+        # DirEntry caches its stat (free on Windows, where scandir already returned it).
+        stat = entry.stat()
+        size = stat.st_size
+        mtime = stat.st_mtime
+    except OSError:
+        size = 0
+        mtime = 0
+
     return {
-        "name": entry_path.name,
+        "name": name,
         "is_dir": is_directory,
-        "path": to_client_path(entry_path, root_dir),
-        "parent_path": to_client_path(entry_path.parent, root_dir),
-        "type": "directory" if is_directory else get_file_type(entry_path.name),
+        "path": client_path,
+        "parent_path": parent_client_path,
+        "type": "directory" if is_directory else get_file_type(name),
+        "size": size,
+        "modified_at": mtime,
     }
 
 
+def _to_client_path_fast(path_str: str, root_str: str) -> str:
+    """to_client_path() for a path reached from the resolved root without following symlinks: no resolve()."""
+    return path_str[len(root_str):].lstrip(os.sep).replace(os.sep, "/")
+
+
 def _normalize_list_limit(max_entries: int) -> int:
     return max(1, min(int(max_entries), LIST_MAX_ENTRIES_CAP))
 
 
-def _iter_ranked_entries(root_dir: Path, directory: Path):
+def _iter_ranked_entries(root_dir: Path, directory: Path, current_path: str):
     with os.scandir(directory) as entries:
         for entry in entries:
             try:
                 is_directory = entry.is_dir(follow_symlinks=False)
+                is_symlink = entry.is_symlink()
             except OSError:
                 continue
-            entry_path = Path(entry.path)
             try:
-                item = _entry_to_item(root_dir, entry_path, is_directory)
+                # Plain children of the resolved directory get their client path by string concatenation;
+                # only symlinks need resolving (and may point outside the root).
+                item = _entry_to_item(
+                    root_dir,
+                    entry,
+                    is_directory,
+                    parent_client_path=None if is_symlink else current_path,
+                )
             except ValueError:
                 continue
-            sort_key = (0 if is_directory else 1, entry.name.casefold(), entry.name)
-            yield sort_key, item
+            yield (0 if is_directory else 1, entry.name.casefold(), entry.name), item
 
 
 def _compute_directory_listing(root_dir: Path, directory: Path, limit: int) -> tuple[str, str | None, bool, tuple[dict[str, Any], ...]]:
-    ranked_items = heapq.nsmallest(limit + 1, _iter_ranked_entries(root_dir, directory), key=lambda row: row[0])
+    current_path = to_client_path(directory, root_dir)
+    ranked_items = list(_iter_ranked_entries(root_dir, directory, current_path))
+    if (limit + 1) * 4 < len(ranked_items):
+        # Only a small head of a big directory is kept: a bounded heap beats sorting everything.
+        ranked_items = heapq.nsmallest(limit + 1, ranked_items, key=itemgetter(0))
+    else:
+        ranked_items.sort(key=itemgetter(0))
     truncated = len(ranked_items) > limit
     if truncated:
         ranked_items = ranked_items[:limit]
     items = tuple(item for _, item in ranked_items)
-    current_path = to_client_path(directory, root_dir)
     parent_path = None if directory == root_dir else to_client_path(directory.parent, root_dir)
     return current_path, parent_path, truncated, items
 
@@ -186,6 +241,52 @@ def list_directory(root_dir: Path, directory: Path, *, max_entries: int = LIST_D
     }
 
 
+def _scan_sorted_directory(directory: str) -> tuple[list[os.DirEntry[str]], list[os.DirEntry[str]]] | None:
+    directories: list[os.DirEntry[str]] = []
+    files: list[os.DirEntry[str]] = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    is_directory = entry.is_dir()
+                except OSError:
+                    is_directory = False
+                (directories if is_directory else files).append(entry)
+    except OSError:
+        # Keep search resilient when some directories are inaccessible.
+        return None
+    directories.sort(key=lambda entry: entry.name.casefold())
+    files.sort(key=lambda entry: entry.name.casefold())
+    return directories, files
+
+
+def _walk_sorted_entries(start_directory: Path):
+    """Walk like os.walk(topdown, followlinks=False) with casefold-sorted levels, keeping DirEntry objects.
+
+    The next few directories on the stack are read ahead on a small thread pool, so getdents and
+    d_type stats overlap with matching; results are still yielded in plain depth-first order.
+    """
+    pending = [os.fspath(start_directory)]
+    scans: dict[str, Future] = {}
+    try:
+        while pending:
+            for path in pending[-SEARCH_SCAN_PREFETCH:]:
+                if path not in scans:
+                    scans[path] = _search_scan_executor.submit(_scan_sorted_directory, path)
+            directory = pending.pop()
+            listing = scans.pop(directory).result()
+            if listing is None:
+                continue
+            directories, files = listing
+            yield directory, directories, files
+            # Reversed so the first directory in sorted order is walked next (depth-first, like os.walk).
+            pending.extend(entry.path for entry in reversed(directories) if not entry.is_symlink())
+    finally:
+        # The caller stopped early (enough results): drop read-aheads that have not started.
+        for scan in scans.values():
+            scan.cancel()
+
+
 def search_entries(
     root_dir: Path,
     start_directory: Path,
@@ -207,49 +308,65 @@ def search_entries(
     capped_limit = max(1, min(max_results, 1000))
     items: list[dict[str, Any]] = []
     truncated = False
+    # Resolved once: the walk below never leaves it through a symlink, so every directory it yields
+    # converts to a client path by stripping this prefix.
+    root_str = str(root_dir.resolve())
+    start_directory = start_directory.resolve()
 
-    def match_and_add(path_obj: Path, is_directory: bool) -> bool:
+    def add_item(item: dict[str, Any]) -> bool:
         nonlocal truncated
-        try:
-            client_path = to_client_path(path_obj, root_dir)
-        except ValueError:
-            return False
-        haystacks = (path_obj.name.casefold(), client_path.casefold())
-        if not any(normalized_query in hay for hay in haystacks):
-            return False
-        items.append(_entry_to_item(root_dir, path_obj, is_directory))
+        items.append(item)
         if len(items) >= capped_limit:
             truncated = True
             return True
         return False
 
+    def level_matcher(directory_client_path: str):
+        # A non-symlink child's client path is "<directory client path>/<name>", so the query either sits
+        # in the directory part (every entry matches), or in the name plus the few characters before it.
+        # That costs one casefold per candidate; the client path string is only built for matches.
+        prefix = f"{directory_client_path}/".casefold() if directory_client_path else ""
+        whole_level = normalized_query in prefix
+        boundary = prefix[max(0, len(prefix) - len(normalized_query) + 1):] if len(normalized_query) > 1 else ""
+
+        def add_if_match(entry: os.DirEntry[str], is_directory: bool) -> bool:
+            if entry.is_symlink():
+                # Symlinks report their resolved target (or are skipped outside the root), as before.
+                try:
+                    client_path = to_client_path(Path(entry.path), root_dir)
+                except ValueError:
+                    return False
+                if normalized_query not in entry.name.casefold() and normalized_query not in client_path.casefold():
+                    return False
+                return add_item(_entry_to_item(root_dir, entry, is_directory))
+            if not whole_level and normalized_query not in boundary + entry.name.casefold():
+                return False
+            return add_item(_entry_to_item(root_dir, entry, is_directory, parent_client_path=directory_client_path))
+
+        return add_if_match
+
     if recursive:
-        def _on_walk_error(_: OSError) -> None:
-            return
-
-        for dirpath, dirnames, filenames in os.walk(start_directory, topdown=True, followlinks=False, onerror=_on_walk_error):
-            dirnames.sort(key=str.casefold)
-            filenames.sort(key=str.casefold)
-            current_dir = Path(dirpath)
-            for directory_name in dirnames:
-                if match_and_add(current_dir / directory_name, True):
+        for directory, directories, files in _walk_sorted_entries(start_directory):
+            add_if_match = level_matcher(_to_client_path_fast(directory, root_str))
+            for entry in directories:
+                if add_if_match(entry, True):
                     break
             if truncated:
                 break
-            for filename in filenames:
-                if match_and_add(current_dir / filename, False):
+            for entry in files:
+                if add_if_match(entry, False):
                     break
             if truncated:
                 break
     else:
+        add_if_match = level_matcher(_to_client_path_fast(str(start_directory), root_str))
         with os.scandir(start_directory) as entries:
             for entry in entries:
                 try:
-                    path_obj = Path(entry.path)
                     is_directory = entry.is_dir(follow_symlinks=False)
                 except OSError:
                     continue
-                if match_and_add(path_obj, is_directory):
+                if add_if_match(entry, is_directory):
                     break
 
     items.sort(key=lambda item: (not item["is_dir"], item["path"].casefold()))
@@ -7,7 +7,7 @@ from pydantic import BaseModel, Field
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from shared.schemas import VisibilityRequest
+from shared.schemas import DeviceName, ShareName, VisibilityRequest
 
 from ..config import load_config
 from ..db import get_db
@@ -22,7 +22,7 @@ internal_router = APIRouter(prefix="/api/v1/internal", tags=["internal"])
 
 class AgentShareRegistration(BaseModel):
     share_id: str | None = None
-    name: str = Field(min_length=1, max_length=120)
+    name: ShareName
     root_path: str = Field(min_length=1, max_length=500)
     read_only: bool = False
 
@@ -30,7 +30,7 @@ class AgentShareRegistration(BaseModel):
 class AgentRegisterRequest(BaseModel):
     agent_device_id: str | None = None
     owner_principal_id: str
-    name: str = Field(min_length=1, max_length=120)
+    name: DeviceName
     base_url: str = Field(min_length=1, max_length=300)
     visible: bool = True
     shares: list[AgentShareRegistration] = Field(default_factory=list)
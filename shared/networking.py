@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
 import json
 import ipaddress
 import os
@@ -106,7 +106,23 @@ def _parse_cidr_list(raw_value: str) -> list[ipaddress.IPv4Network]:
     return networks
 
 
+_CANDIDATE_IPV4_TTL_SECONDS = 5.0
+_candidate_ipv4_cache: tuple[float, list[str]] | None = None
+
+
 def _collect_candidate_ipv4() -> list[str]:
+    # Page renders ask for the local addresses several times; the probes below include hostname lookups.
+    global _candidate_ipv4_cache
+    now = time.monotonic()
+    cached = _candidate_ipv4_cache
+    if cached and (now - cached[0]) < _CANDIDATE_IPV4_TTL_SECONDS:
+        return list(cached[1])
+    candidates = _probe_candidate_ipv4()
+    _candidate_ipv4_cache = (now, candidates)
+    return list(candidates)
+
+
+def _probe_candidate_ipv4() -> list[str]:
     candidates: list[str] = []
 
     try:
@@ -243,29 +259,45 @@ def coordinator_seed_urls(*, port: int = 7000) -> list[str]:
     return _ordered_unique(sorted(urls, key=_rank_url_host))
 
 
-def _probe_coordinator_urls(
+async def _tcp_port_open(host: str, port: int, timeout_seconds: float) -> bool:
+    try:
+        _reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout_seconds)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def _probe_coordinator_urls_async(
     urls: list[str],
     *,
     timeout_seconds: float,
-    max_workers: int,
+    max_concurrency: int,
     max_results: int,
-    seen: set[str] | None = None,
+    seen_values: set[str],
 ) -> list[str]:
-    if not urls or max_results <= 0:
-        return []
+    limiter = asyncio.Semaphore(max_concurrency)
+
+    async def probe(url: str) -> str | None:
+        parsed = urllib_parse.urlparse(url)
+        host = str(parsed.hostname or "")
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        async with limiter:
+            if not await _tcp_port_open(host, port, timeout_seconds):
+                return None
+        # Only hosts that accepted the connection get the (blocking) HTTP check.
+        return await asyncio.to_thread(_coordinator_probe, url, timeout_seconds)
 
-    seen_values = set(seen or set())
-    workers = max(4, min(int(max_workers), max(8, len(urls))))
     discovered: list[str] = []
-    executor = ThreadPoolExecutor(max_workers=workers)
-    futures = {
-        executor.submit(_coordinator_probe, url, timeout_seconds): url
-        for url in urls
-    }
+    tasks = [asyncio.ensure_future(probe(url)) for url in urls]
     try:
-        for future in as_completed(futures):
+        for next_done in asyncio.as_completed(tasks):
             try:
-                value = future.result()
+                value = await next_done
             except Exception:  # noqa: BLE001
                 continue
             if not value or value in seen_values:
@@ -275,13 +307,41 @@ def _probe_coordinator_urls(
             if len(discovered) >= max_results:
                 break
     finally:
-        for future in futures:
-            if not future.done():
-                future.cancel()
-        executor.shutdown(wait=False, cancel_futures=True)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
     return discovered
 
 
+def _probe_coordinator_urls(
+    urls: list[str],
+    *,
+    timeout_seconds: float,
+    max_workers: int,
+    max_results: int,
+    seen: set[str] | None = None,
+) -> list[str]:
+    if not urls or max_results <= 0:
+        return []
+
+    concurrency = max(4, min(int(max_workers), max(8, len(urls))))
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(
+            _probe_coordinator_urls_async(
+                urls,
+                timeout_seconds=timeout_seconds,
+                max_concurrency=concurrency,
+                max_results=max_results,
+                seen_values=set(seen or set()),
+            )
+        )
+    finally:
+        # Unlike asyncio.run(), closing the loop directly does not wait for HTTP checks still running in
+        # worker threads once enough coordinators were found.
+        loop.close()
+
+
 _DISCOVERY_CACHE: dict[tuple[int, int, int, int], tuple[float, list[str]]] = {}
 
 
@@ -1,14 +1,41 @@
 from __future__ import annotations
 
+import re
 from datetime import datetime
-from typing import Literal
+from typing import Annotated, Any, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+_PASSCODE_RE = re.compile(r"\d{4}", re.ASCII)
+
+# Reused constrained types: identical constraints share one core schema instead of one per field.
+DisplayName = Annotated[str, Field(min_length=1, max_length=80)]
+DeviceName = Annotated[str, Field(min_length=1, max_length=120)]
+ShareName = Annotated[str, Field(min_length=1, max_length=120)]
+Sha256Hex = Annotated[str, Field(pattern=r"^[0-9a-fA-F]{64}$")]
+MimeType = Annotated[str, Field(max_length=120)]
+DestinationPath = Annotated[str, Field(max_length=400)]
+
+
+class _PasscodeRequest(BaseModel):
+    passcode: str
+
+    @field_validator("passcode")
+    @classmethod
+    def _validate_passcode(cls, value: str) -> str:
+        if not _PASSCODE_RE.fullmatch(value):
+            raise ValueError("Passcode must be exactly 4 digits")
+        return value
+
+    @classmethod
+    def from_trusted(cls, **values: Any):
+        # Skips validation; only for payloads built by coordinator code, never request bodies.
+        return cls.model_construct(**values)
 
 
 class PairingStartRequest(BaseModel):
-    display_name: str = Field(min_length=1, max_length=80)
-    device_name: str = Field(min_length=1, max_length=120)
+    display_name: DisplayName
+    device_name: DeviceName
     platform: str = Field(min_length=1, max_length=60)
     public_key: str | None = Field(default=None, max_length=4096)
 
@@ -51,8 +78,8 @@ class EventsWsTokenResponse(BaseModel):
 class TransferItemInput(BaseModel):
     filename: str = Field(min_length=1, max_length=255)
     size: int = Field(ge=0)
-    sha256: str = Field(min_length=64, max_length=64)
-    mime_type: str | None = Field(default=None, max_length=120)
+    sha256: Sha256Hex
+    mime_type: MimeType | None = None
 
 
 class TransferCreateRequest(BaseModel):
@@ -61,17 +88,16 @@ class TransferCreateRequest(BaseModel):
     items: list[TransferItemInput] = Field(min_length=1, max_length=200)
 
 
-class TransferApproveRequest(BaseModel):
-    passcode: str = Field(pattern=r"^\d{4}$")
-    destination_path: str = Field(default="", max_length=400)
+class TransferApproveRequest(_PasscodeRequest):
+    destination_path: DestinationPath = ""
 
 
 class TransferRejectRequest(BaseModel):
     reason: str | None = Field(default=None, max_length=500)
 
 
-class PasscodeOpenRequest(BaseModel):
-    passcode: str = Field(pattern=r"^\d{4}$")
+class PasscodeOpenRequest(_PasscodeRequest):
+    pass
 
 
 class VisibilityRequest(BaseModel):
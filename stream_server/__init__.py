@@ -4,14 +4,15 @@ import sys
 from flask import Flask
 from pathlib import Path
 
-from .config import AppConfig, BASE_DIR
-from .routes import web
+from .config import BASE_DIR, load_app_config
+from .json_provider import OrjsonProvider
+from .routes import api, web
 
 
 def _resource_root() -> Path:
     if getattr(sys, "frozen", False):
-        return Path(getattr(sys, "_MEIPASS", str(BASE_DIR)))
-    return BASE_DIR
+        return Path(getattr(sys, "_MEIPASS", str(BASE_DIR.resolve())))
+    return BASE_DIR.resolve()
 
 
 def create_app() -> Flask:
@@ -21,6 +22,8 @@ def create_app() -> Flask:
         template_folder=str(resource_root / "templates"),
         static_folder=str(resource_root / "static"),
     )
-    app.config.from_object(AppConfig)
+    app.json = OrjsonProvider(app)
+    app.config.update(load_app_config())
     app.register_blueprint(web)
+    app.register_blueprint(api)
     return app
@@ -1,43 +1,65 @@
 from __future__ import annotations
 
+import hmac
 from functools import wraps
+from pathlib import Path
 from typing import Any, Callable, TypeVar, cast
+from urllib.parse import urlencode
 
 from flask import current_app, jsonify, redirect, request, session, url_for
 
+from .settings_store import hash_pin
+
 F = TypeVar("F", bound=Callable[..., Any])
-API_PREFIXES = (
-    "/list",
-    "/search",
-    "/stream",
-    "/stream_transcode",
-    "/thumbnail",
-    "/get_adjacent_file",
-    "/download",
-    "/video_info",
-    "/api/hubs",
-)
+API_BLUEPRINT = "api"
+_resolved_root_dirs: dict[str, Path] = {}
+_endpoint_urls: dict[tuple[str, str], str] = {}
+
+
+def is_setup_complete() -> bool:
+    # Set from is_valid_pin() whenever the PIN is loaded or saved, so this is a plain flag read.
+    return bool(current_app.config.get("SETUP_COMPLETE"))
+
+
+def pin_matches(candidate: str) -> bool:
+    expected = current_app.config.get("PIN_HASH") or hash_pin(str(current_app.config.get("PIN", "")))
+    return hmac.compare_digest(hash_pin(candidate), expected)
+
+
+def configured_root_dir() -> Path:
+    # ROOT_DIR only changes through /setup, so resolve() (a realpath syscall) runs once per value.
+    raw = str(current_app.config["ROOT_DIR"])
+    resolved = _resolved_root_dirs.get(raw)
+    if resolved is None:
+        resolved = _resolved_root_dirs[raw] = Path(raw).resolve()
+    return resolved
 
 
-def _is_setup_complete() -> bool:
-    pin = str(current_app.config.get("PIN", "")).strip()
-    return pin.isdigit() and len(pin) >= 4
+def endpoint_url(endpoint: str, **query: str) -> str:
+    # Argument-free endpoints always build the same URL for a given script root.
+    key = (endpoint, request.script_root)
+    url = _endpoint_urls.get(key)
+    if url is None:
+        url = _endpoint_urls[key] = url_for(endpoint)
+    if query:
+        return f"{url}?{urlencode(query, safe='/')}"
+    return url
 
 
 def require_pin(view: F) -> F:
     @wraps(view)
     def wrapped(*args: Any, **kwargs: Any):
-        if not _is_setup_complete():
-            if request.path.startswith(API_PREFIXES):
+        if not is_setup_complete():
+            if request.blueprint == API_BLUEPRINT:
                 return jsonify({"error": "Setup required"}), 503
-            return redirect(url_for("web.setup"))
+            return redirect(endpoint_url("web.setup"))
 
         if session.get("authenticated"):
             return view(*args, **kwargs)
 
-        if request.path.startswith(API_PREFIXES):
+        if request.blueprint == API_BLUEPRINT:
             return jsonify({"error": "Authentication required"}), 401
 
-        return redirect(url_for("web.login", next=request.path))
+        return redirect(endpoint_url("web.login", next=request.path))
 
     return cast(F, wrapped)
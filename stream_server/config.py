@@ -1,19 +1,49 @@
 from __future__ import annotations
 
+import os
+from functools import cache
 from pathlib import Path
+from typing import Any
 
-from .settings_store import resolve_runtime_settings
+from shared.runtime import env_bool, env_int
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-_runtime = resolve_runtime_settings()
+from .settings_store import hash_pin, resolve_runtime_settings
 
+# Resolved lazily by create_app(); keeps `import stream_server` free of filesystem work.
+BASE_DIR = Path(__file__).parent.parent
+THUMBNAIL_SIZE = (220, 220)
 
-class AppConfig:
-    SECRET_KEY = _runtime["secret_key"]
-    PIN = _runtime["pin"]
-    ROOT_DIR = _runtime["root_dir"]
-    PORT = _runtime["port"]
-    AUTO_OPEN_BROWSER = _runtime["auto_open_browser"]
-    SETUP_COMPLETE = _runtime["configured"]
-    SETTINGS_PATH = str(_runtime["settings_path"])
-    THUMBNAIL_SIZE = (220, 220)
+
+@cache
+def runtime_settings() -> dict[str, Any]:
+    return resolve_runtime_settings()
+
+
+def network_config(default_web_port: int) -> dict[str, Any]:
+    # The launcher settles these variables before the web process starts; read them once per app.
+    return {
+        "WEB_PORT": env_int("WEB_PORT", int(default_web_port), minimum=1, maximum=65535),
+        "COORDINATOR_PORT": env_int("COORDINATOR_PORT", 7000, minimum=1, maximum=65535),
+        "AGENT_PORT": env_int("AGENT_PORT", 7001, minimum=1, maximum=65535),
+        "WEB_BIND_HOST": os.environ.get("WEB_HOST", os.environ.get("HOST", "0.0.0.0")).strip() or "0.0.0.0",
+        "COORDINATOR_BIND_HOST": os.environ.get("COORDINATOR_HOST", "0.0.0.0").strip() or "0.0.0.0",
+    }
+
+
+def load_app_config() -> dict[str, Any]:
+    runtime = runtime_settings()
+    return {
+        "SECRET_KEY": runtime["secret_key"],
+        "PIN": runtime["pin"],
+        "PIN_HASH": hash_pin(runtime["pin"]),
+        "ROOT_DIR": runtime["root_dir"],
+        "PORT": runtime["port"],
+        "AUTO_OPEN_BROWSER": runtime["auto_open_browser"],
+        "SETUP_COMPLETE": runtime["configured"],
+        "SETTINGS_PATH": str(runtime["settings_path"]),
+        "THUMBNAIL_SIZE": THUMBNAIL_SIZE,
+        # Let a front-end server (apache/lighttpd X-Sendfile, nginx X-Accel-Redirect) stream file bodies.
+        "USE_X_SENDFILE": env_bool("STREAM_USE_X_SENDFILE", False),
+        "X_ACCEL_REDIRECT_PREFIX": os.environ.get("STREAM_X_ACCEL_REDIRECT_PREFIX", "").strip(),
+        **network_config(runtime["port"]),
+    }
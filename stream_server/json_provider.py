@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from typing import Any
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+try:  # Optional dependency: orjson encodes large listings several times faster than stdlib json.
+    import orjson  # type: ignore[import-not-found]
+except Exception:  # noqa: BLE001
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson and falls back to the stdlib provider."""
+
+    def _orjson_option(self) -> int:
+        # Datetimes go through Flask's default() so they keep the HTTP-date format.
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def _encode(self, obj: Any) -> bytes | None:
+        if orjson is None:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_option())
+        except TypeError:
+            # orjson rejects a few values stdlib json accepts (e.g. integers wider than 64 bits).
+            return None
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if not kwargs:
+            encoded = self._encode(obj)
+            if encoded is not None:
+                return encoded.decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        if not pretty:
+            encoded = self._encode(self._prepare_response_obj(args, kwargs))
+            if encoded is not None:
+                return self._app.response_class(encoded + b"\n", mimetype=self.mimetype)
+        return super().response(*args, **kwargs)
@@ -1,15 +1,24 @@
 from __future__ import annotations
 
-import io
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import ipaddress
 import os
+import re
+import stat
+import threading
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import quote
 
 from flask import (
     Blueprint,
+    Config,
     Response,
     abort,
     current_app,
+    g,
+    has_request_context,
     jsonify,
     redirect,
     render_template,
@@ -17,22 +26,32 @@ from flask import (
     send_file,
     session,
     stream_with_context,
-    url_for,
 )
+from werkzeug.datastructures import ContentRange
 from werkzeug.exceptions import HTTPException
+from werkzeug.utils import send_file as werkzeug_send_file
 
 from shared.networking import discover_coordinators, local_ipv4_addresses, preferred_lan_ipv4
-from shared.runtime import env_int
 
-from .auth import require_pin
-from .settings_store import load_settings, save_settings, settings_path
+from .auth import (
+    API_BLUEPRINT,
+    configured_root_dir,
+    endpoint_url,
+    is_setup_complete,
+    pin_matches,
+    require_pin,
+)
+from .config import THUMBNAIL_SIZE, network_config
+from .settings_store import hash_pin, is_valid_pin, load_settings, save_settings, settings_path, validated_root_dir
 from .services import (
-    generate_cached_thumbnail_bytes,
+    generate_cached_thumbnail,
     generate_thumbnail_bytes,
     resolve_requested_path,
+    warm_h264_encoder,
+    warm_placeholder_thumbnails,
 )
 from stream_server.services.file_service import (
-    get_adjacent_file,
+    get_adjacent_entry,
     get_file_type,
     guess_mimetype,
     iter_transcoded_video_chunks,
@@ -56,6 +75,28 @@ from stream_server.services.hub_proxy import (
 )
 
 web = Blueprint("web", __name__)
+# JSON/binary endpoints; auth and error handling key off request.blueprint instead of the URL.
+api = Blueprint(API_BLUEPRINT, __name__)
+_THUMBNAIL_SIZE_EXTENSION = "stream_server.thumbnail_size"
+
+
+@api.record_once
+def _capture_static_config(state) -> None:
+    # THUMBNAIL_SIZE never changes after startup; normalize it once per app instead of on every request.
+    thumbnail_size = tuple(state.app.config.get("THUMBNAIL_SIZE", THUMBNAIL_SIZE))
+    state.app.extensions[_THUMBNAIL_SIZE_EXTENSION] = thumbnail_size
+    # Placeholders depend only on type and size; render them off the startup path before the first listing asks.
+    threading.Thread(
+        target=warm_placeholder_thumbnails,
+        args=(thumbnail_size,),
+        name="placeholder-thumbnail-warmup",
+        daemon=True,
+    ).start()
+    # The hardware-encoder probe runs a few ffmpeg processes; start it now so no stream waits for it.
+    warm_h264_encoder()
+
+
+# Only consulted when routing failed and no blueprint matched the request.
 API_PREFIXES = (
     "/list",
     "/search",
@@ -68,35 +109,98 @@ API_PREFIXES = (
     "/api/discovery",
     "/api/hub",
     "/api/hubs",
+    "/api/choose_folder",
 )
+# Whole path segments only, so e.g. "/listing" is not mistaken for "/list".
+_API_PREFIX_RE = re.compile("(?:" + "|".join(map(re.escape, API_PREFIXES)) + ")(?:/|$)")
+
+FOLDER_DIALOG_TIMEOUT_SECONDS = 300
+THUMBNAIL_MAX_AGE_SECONDS = 900
+FILE_WRAPPER_BLOCK_SIZE = 256 * 1024
+_SIMPLE_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+_CONDITIONAL_REQUEST_HEADERS = ("If-Range", "If-Match", "If-None-Match", "If-Modified-Since", "If-Unmodified-Since")
+
+# Tk is only ever touched from this one worker thread; the import itself is deferred to first use.
+_folder_dialog_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-folder-dialog")
+_folder_dialog_lock = threading.Lock()
+_folder_dialog_future: Future[str] | None = None
+_tk_root: Any = None
+
+
+def _dialog_root() -> Any:
+    # Keep one hidden root for the life of the worker thread instead of building and tearing down Tk per pick.
+    global _tk_root
+    import tkinter as tk
+
+    if _tk_root is not None:
+        try:
+            _tk_root.winfo_exists()
+            return _tk_root
+        except tk.TclError:
+            _tk_root = None
+
+    root = tk.Tk()
+    root.withdraw()
+    root.attributes("-topmost", True)
+    _tk_root = root
+    return root
 
-def _is_setup_complete() -> bool:
-    pin = str(current_app.config.get("PIN", "")).strip()
-    return pin.isdigit() and len(pin) >= 4
 
+def _ask_directory() -> str:
+    from tkinter import filedialog
 
-def _root_dir() -> Path:
-    return Path(current_app.config["ROOT_DIR"]).resolve()
+    return filedialog.askdirectory(parent=_dialog_root(), title="Select Shared Folder")
 
 
+def _folder_dialog() -> Future[str]:
+    # Requests arriving while the dialog is open wait for that same dialog rather than queueing another.
+    global _folder_dialog_future
+    with _folder_dialog_lock:
+        if _folder_dialog_future is None or _folder_dialog_future.done():
+            _folder_dialog_future = _folder_dialog_executor.submit(_ask_directory)
+        return _folder_dialog_future
+
+
+_WILDCARD_BIND_HOSTS = frozenset({"", "0.0.0.0", "::"})
+_LOOPBACK_BIND_HOSTS = frozenset({"localhost", "127.0.0.1", "::1"})
+
+
+@lru_cache(maxsize=32)
 def _is_lan_bind_host(host_value: str) -> bool:
+    # Only ever called with the handful of configured bind hosts, so repeat renders are one dict lookup.
     host = str(host_value or "").strip().lower()
-    if not host:
+    if host in _WILDCARD_BIND_HOSTS:
         return True
-    if host in {"0.0.0.0", "::"}:
-        return True
-    if host in {"localhost", "127.0.0.1", "::1"}:
+    if host in _LOOPBACK_BIND_HOSTS:
         return False
     return not host.startswith("127.")
 
 
+def _request_settings() -> dict[str, Any]:
+    # The index page reads settings from both network helpers; parse the file once per request.
+    if not has_request_context():
+        return load_settings()
+    if "settings" not in g:
+        g.settings = load_settings()
+    return g.settings
+
+
+def _network_config() -> Config:
+    config = current_app.config
+    if "WEB_PORT" not in config:
+        # Apps assembled without create_app() take the snapshot on first use.
+        config.update(network_config(int(config.get("PORT", 5000))))
+    return config
+
+
 def _network_bootstrap_context() -> dict[str, object]:
-    settings = load_settings()
-    web_port = env_int("WEB_PORT", int(current_app.config.get("PORT", 5000)), minimum=1, maximum=65535)
-    coordinator_port = env_int("COORDINATOR_PORT", 7000, minimum=1, maximum=65535)
-    agent_port = env_int("AGENT_PORT", 7001, minimum=1, maximum=65535)
-    web_bind_host = os.environ.get("WEB_HOST", os.environ.get("HOST", "0.0.0.0")).strip() or "0.0.0.0"
-    coordinator_bind_host = os.environ.get("COORDINATOR_HOST", "0.0.0.0").strip() or "0.0.0.0"
+    settings = _request_settings()
+    config = _network_config()
+    web_port = config["WEB_PORT"]
+    coordinator_port = config["COORDINATOR_PORT"]
+    agent_port = config["AGENT_PORT"]
+    web_bind_host = config["WEB_BIND_HOST"]
+    coordinator_bind_host = config["COORDINATOR_BIND_HOST"]
 
     lan_ip = preferred_lan_ipv4()
     addresses = local_ipv4_addresses(include_loopback=False)
@@ -152,7 +256,7 @@ def _is_local_request_address(remote_addr: str | None) -> bool:
 
 
 def _network_session_defaults(*, include_identity: bool) -> dict[str, str]:
-    settings = load_settings()
+    settings = _request_settings()
     default_coord = str(os.environ.get("STREAM_DEFAULT_COORDINATOR_URL", "")).strip().rstrip("/")
     if not default_coord:
         default_coord = str(settings.get("network_coordinator_url") or "").strip().rstrip("/")
@@ -189,21 +293,171 @@ def _network_session_defaults(*, include_identity: bool) -> dict[str, str]:
 
 def _resolve_or_400(raw_path: str | None) -> Path:
     try:
-        return resolve_requested_path(_root_dir(), raw_path)
+        return resolve_requested_path(configured_root_dir(), raw_path)
     except ValueError as exc:
         abort(400, description=str(exc))
 
 
+def _stat_file_or_404(target: Path, description: str = "File not found") -> os.stat_result:
+    # One stat() replaces exists() + is_file() and is reused for the ETag.
+    try:
+        file_stat = target.stat()
+    except OSError:
+        abort(404, description=description)
+    if not stat.S_ISREG(file_stat.st_mode):
+        abort(404, description=description)
+    return file_stat
+
+
+def _require_directory(target: Path) -> None:
+    try:
+        target_stat = target.stat()
+    except OSError:
+        abort(404, description="Directory not found")
+    if not stat.S_ISDIR(target_stat.st_mode):
+        abort(400, description="Path must point to a directory")
+
+
+def _simple_byte_range(size: int) -> tuple[int, int] | None:
+    """Return ``(start, stop)`` for a single-range request with no validators, else ``None``."""
+    match = _SIMPLE_RANGE_RE.fullmatch(request.headers.get("Range", ""))
+    if match is None or size <= 0 or any(name in request.headers for name in _CONDITIONAL_REQUEST_HEADERS):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        stop = min(int(last) + 1, size) if last else size
+    elif last:
+        start = max(0, size - int(last))
+        stop = size
+    else:
+        return None
+    # Unsatisfiable or inverted ranges fall through so Werkzeug answers them with 416.
+    return (start, stop) if start < stop else None
+
+
+def _send_local_file(
+    target: Path,
+    file_stat: os.stat_result,
+    *,
+    mimetype: str | None = None,
+    **kwargs: Any,
+) -> Response:
+    accel_prefix = str(current_app.config.get("X_ACCEL_REDIRECT_PREFIX") or "")
+    if not accel_prefix and not current_app.config.get("USE_X_SENDFILE"):
+        etag = f"{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"
+        file_wrapper = request.environ.get("wsgi.file_wrapper")
+        byte_range = _simple_byte_range(file_stat.st_size) if file_wrapper is not None else None
+        if byte_range is not None:
+            # Media seeks: answer the range directly from the stat we already have instead of letting
+            # Werkzeug re-stat the file and run its full conditional/range machinery.
+            start, stop = byte_range
+            handle = open(target, "rb")
+            handle.seek(start)
+            kwargs.setdefault("download_name", target.name)
+            response = send_file(
+                handle,
+                mimetype=mimetype,
+                conditional=False,
+                etag=etag,
+                last_modified=file_stat.st_mtime,
+                **kwargs,
+            )
+            response.status_code = 206
+            response.content_length = stop - start
+            response.content_range = ContentRange("bytes", start, stop, file_stat.st_size)
+            response.accept_ranges = "bytes"
+            return response
+
+        response = send_file(target, mimetype=mimetype, conditional=True, etag=etag, **kwargs)
+        if response.status_code == 206 and file_wrapper is not None and response.content_range is not None:
+            # Werkzeug slices ranges in Python; a file positioned at the range start lets the server's
+            # file_wrapper (waitress buffer, gunicorn sendfile) send it, bounded by Content-Length.
+            response.response.close()
+            handle = open(target, "rb")
+            handle.seek(response.content_range.start)
+            response.response = file_wrapper(handle, FILE_WRAPPER_BLOCK_SIZE)
+        return response
+
+    # The front-end server sends the body with sendfile(2) and answers Range/conditional requests itself.
+    response = werkzeug_send_file(
+        target,
+        request.environ,
+        mimetype=mimetype,
+        use_x_sendfile=True,
+        response_class=current_app.response_class,
+        conditional=False,
+        **kwargs,
+    )
+    if accel_prefix:
+        response.headers.pop("X-Sendfile", None)
+        client_path = to_client_path(target, configured_root_dir())
+        response.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{quote(client_path)}"
+    return response
+
+
+def _thumbnail_response(
+    target_stat: os.stat_result,
+    size: tuple[int, int],
+    render: Callable[[], tuple[bytes, bool]],
+) -> Response:
+    # Validators come from the source file, so a warm If-None-Match is answered without touching Pillow.
+    width, height = size
+    etag = f"{target_stat.st_mtime_ns:x}-{target_stat.st_size:x}-{width}x{height}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        try:
+            payload, fallback = render()
+        except (FileNotFoundError, PermissionError, OSError):
+            abort(404)
+        response = Response(payload, mimetype="image/jpeg")
+        if fallback:
+            # A fallback (busy render queue, failed render) must not be pinned by a validator that only
+            # changes with the source file; the next request should try the real thumbnail again.
+            response.cache_control.no_store = True
+            return response
+    response.set_etag(etag)
+    response.last_modified = target_stat.st_mtime
+    response.cache_control.public = True
+    response.cache_control.max_age = THUMBNAIL_MAX_AGE_SECONDS
+    return response
+
+
+def _wants_ndjson() -> bool:
+    return (request.args.get("stream") or "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _ndjson_response(payload: dict[str, Any]) -> Response:
+    """Stream a listing as NDJSON: a header line with everything but ``items``, then one line per item."""
+    items = payload.pop("items")
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield f"{dumps(payload)}\n"
+        for item in items:
+            yield f"{dumps(item)}\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def _remote_json_params() -> dict[str, str]:
+    # Remote hubs are always proxied as a single JSON document.
+    params = request_query_params(request.query_string)
+    params.pop("stream", None)
+    return params
+
+
 @web.app_errorhandler(HTTPException)
 def handle_http_error(error: HTTPException):
-    if request.path.startswith(API_PREFIXES):
+    if request.blueprint == API_BLUEPRINT or (request.blueprint is None and _API_PREFIX_RE.match(request.path) is not None):
         return jsonify({"error": error.description}), error.code
     return error
 
 
 @web.route("/setup", methods=["GET", "POST"])
 def setup():
-    setup_complete = _is_setup_complete()
+    setup_complete = is_setup_complete()
     require_current_pin = setup_complete and not session.get("authenticated")
 
     error: str | None = None
@@ -219,16 +473,13 @@ def setup():
         current_pin = (request.form.get("current_pin") or "").strip()
         auto_open_browser = request.form.get("auto_open_browser") == "on"
 
-        try:
-            resolved_root = Path(root_input).expanduser().resolve()
-        except OSError:
-            resolved_root = None
+        resolved_root = validated_root_dir(root_input)
 
-        if require_current_pin and current_pin != str(current_app.config.get("PIN", "")):
+        if require_current_pin and not pin_matches(current_pin):
             error = "Enter your current PIN to update settings."
-        elif not resolved_root or not resolved_root.exists() or not resolved_root.is_dir():
+        elif resolved_root is None:
             error = "Choose a valid folder path that exists on this device."
-        elif not pin.isdigit() or len(pin) < 4 or len(pin) > 12:
+        elif not is_valid_pin(pin):
             error = "PIN must be 4 to 12 digits."
         elif pin != pin_confirm:
             error = "PIN confirmation does not match."
@@ -242,11 +493,12 @@ def setup():
             save_settings(updated)
             current_app.config["ROOT_DIR"] = resolved_root
             current_app.config["PIN"] = pin
+            current_app.config["PIN_HASH"] = hash_pin(pin)
             current_app.config["AUTO_OPEN_BROWSER"] = auto_open_browser
-            current_app.config["SETUP_COMPLETE"] = True
+            current_app.config["SETUP_COMPLETE"] = is_valid_pin(pin)
             session.clear()
             message = "Setup saved."
-            return redirect(url_for("web.login", setup="done"))
+            return redirect(endpoint_url("web.login", setup="done"))
 
         root_value = root_input
 
@@ -262,22 +514,17 @@ def setup():
     )
 
 
-@web.get("/api/choose_folder")
+@api.get("/api/choose_folder")
 @require_pin
 def choose_folder():
+    future = _folder_dialog()
     try:
-        import tkinter as tk
-        from tkinter import filedialog
-        
-        root = tk.Tk()
-        root.withdraw()
-        root.attributes('-topmost', True)
-        folder_path = filedialog.askdirectory(parent=root, title="Select Shared Folder")
-        root.destroy()
-        
-        return jsonify({"path": folder_path})
+        folder_path = future.result(timeout=FOLDER_DIALOG_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        return jsonify({"error": "Folder picker timed out"}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    return jsonify({"path": folder_path})
 
 
 @web.get("/")
@@ -286,16 +533,16 @@ def index():
     session_defaults = _network_session_defaults(include_identity=_is_local_request_address(request.remote_addr))
     return render_template(
         "index.html",
-        root_dir=str(_root_dir()),
+        root_dir=str(configured_root_dir()),
         network_info=_network_bootstrap_context(),
         network_session_defaults=session_defaults,
     )
 
 
-@web.get("/api/discovery/coordinators")
+@api.get("/api/discovery/coordinators")
 @require_pin
 def discover_coordinator_hosts():
-    port = env_int("COORDINATOR_PORT", 7000, minimum=1, maximum=65535)
+    port = _network_config()["COORDINATOR_PORT"]
     discovered = discover_coordinators(port=port, timeout_seconds=0.16, max_workers=48, max_results=12)
     bootstrap = _network_bootstrap_context()
     coordinator_urls = [str(value).strip().rstrip("/") for value in bootstrap.get("coordinator_urls", []) if str(value).strip()]
@@ -309,51 +556,48 @@ def discover_coordinator_hosts():
     return jsonify({"coordinators": all_candidates, "default": default_url})
 
 
-@web.get("/api/hub/meta")
+@api.get("/api/hub/meta")
 def hub_meta():
     return jsonify(public_hub_meta(request.url_root))
 
 
-@web.get("/api/hubs")
+@api.get("/api/hubs")
 @require_pin
 def list_hubs():
     refresh = (request.args.get("refresh") or "").strip().lower() in {"1", "true", "yes", "on"}
     return jsonify(list_hubs_payload(refresh=refresh))
 
 
-@web.post("/api/hubs/select")
+@api.post("/api/hubs/select")
 @require_pin
 def select_hub():
     payload = request.get_json(silent=True) or {}
     return jsonify(select_hub_payload(payload))
 
 
-@web.post("/api/hubs/unlock")
+@api.post("/api/hubs/unlock")
 @require_pin
 def unlock_hub():
     payload = request.get_json(silent=True) or {}
     return jsonify(unlock_hub_payload(payload))
 
 
-@web.post("/api/hubs/lock")
+@api.post("/api/hubs/lock")
 @require_pin
 def lock_hub():
     payload = request.get_json(silent=True) or {}
     return jsonify(lock_hub_payload(payload))
 
 
-@web.get("/list")
+@api.get("/list")
 @require_pin
 def list_files():
     remote_hub = active_remote_hub()
     if remote_hub is not None:
-        return proxy_remote_json(remote_hub, "/list", params=request_query_params(request.query_string))
+        return proxy_remote_json(remote_hub, "/list", params=_remote_json_params())
 
     target = _resolve_or_400(request.args.get("path"))
-    if not target.exists():
-        abort(404, description="Directory not found")
-    if not target.is_dir():
-        abort(400, description="Path must point to a directory")
+    _require_directory(target)
     try:
         max_results = int((request.args.get("max") or "400").strip())
         page = int((request.args.get("page") or "1").strip())
@@ -361,32 +605,31 @@ def list_files():
         abort(400, description="max and page must be integers")
 
     try:
-        payload = list_directory(_root_dir(), target, max_entries=max_results, page=page)
+        payload = list_directory(configured_root_dir(), target, max_entries=max_results, page=page)
     except PermissionError:
         abort(403, description="Permission denied")
+    if _wants_ndjson():
+        return _ndjson_response(payload)
     return jsonify(payload)
 
 
-@web.get("/search")
+@api.get("/search")
 @require_pin
 def search_files():
     remote_hub = active_remote_hub()
     if remote_hub is not None:
-        return proxy_remote_json(remote_hub, "/search", params=request_query_params(request.query_string))
+        return proxy_remote_json(remote_hub, "/search", params=_remote_json_params())
 
     query = (request.args.get("q") or "").strip()
     target = _resolve_or_400(request.args.get("path"))
-    if not target.exists():
-        abort(404, description="Directory not found")
-    if not target.is_dir():
-        abort(400, description="Path must point to a directory")
+    _require_directory(target)
 
     recursive = (request.args.get("recursive") or "1").strip().lower() in {"1", "true", "yes", "on"}
     if not query:
         return jsonify(
             {
                 "query": "",
-                "base_path": to_client_path(target, _root_dir()),
+                "base_path": to_client_path(target, configured_root_dir()),
                 "recursive": recursive,
                 "items": [],
                 "truncated": False,
@@ -400,7 +643,7 @@ def search_files():
 
     try:
         payload = search_entries(
-            _root_dir(),
+            configured_root_dir(),
             target,
             query,
             recursive=recursive,
@@ -408,10 +651,12 @@ def search_files():
         )
     except PermissionError:
         abort(403, description="Permission denied")
+    if _wants_ndjson():
+        return _ndjson_response(payload)
     return jsonify(payload)
 
 
-@web.get("/stream")
+@api.get("/stream")
 @require_pin
 def stream_file():
     remote_hub = active_remote_hub()
@@ -424,15 +669,14 @@ def stream_file():
         )
 
     target = _resolve_or_400(request.args.get("path"))
-    if not target.exists() or not target.is_file():
-        abort(404, description="File not found")
+    file_stat = _stat_file_or_404(target)
 
     file_type = get_file_type(target.name)
     mimetype = guess_mimetype(target, file_type)
-    return send_file(target, mimetype=mimetype, conditional=True, etag=True)
+    return _send_local_file(target, file_stat, mimetype=mimetype)
 
 
-@web.get("/download")
+@api.get("/download")
 @require_pin
 def download_file():
     remote_hub = active_remote_hub()
@@ -445,18 +689,11 @@ def download_file():
         )
 
     target = _resolve_or_400(request.args.get("path"))
-    if not target.exists() or not target.is_file():
-        abort(404, description="File not found")
-    return send_file(
-        target,
-        as_attachment=True,
-        download_name=target.name,
-        conditional=True,
-        etag=True,
-    )
+    file_stat = _stat_file_or_404(target)
+    return _send_local_file(target, file_stat, as_attachment=True, download_name=target.name)
 
 
-@web.get("/stream_transcode")
+@api.get("/stream_transcode")
 @require_pin
 def stream_transcoded_video():
     remote_hub = active_remote_hub()
@@ -469,8 +706,7 @@ def stream_transcoded_video():
         )
 
     target = _resolve_or_400(request.args.get("path"))
-    if not target.exists() or not target.is_file():
-        abort(404, description="File not found")
+    _stat_file_or_404(target)
 
     if get_file_type(target.name) != "video":
         abort(400, description="Transcode endpoint supports video files only")
@@ -490,7 +726,7 @@ def stream_transcoded_video():
     return Response(stream_with_context(stream_iter), mimetype="video/mp4", headers=headers)
 
 
-@web.get("/video_info")
+@api.get("/video_info")
 @require_pin
 def video_info():
     remote_hub = active_remote_hub()
@@ -498,15 +734,14 @@ def video_info():
         return proxy_remote_json(remote_hub, "/video_info", params=request_query_params(request.query_string))
 
     target = _resolve_or_400(request.args.get("path"))
-    if not target.exists() or not target.is_file():
-        abort(404, description="File not found")
+    target_stat = _stat_file_or_404(target)
 
     if get_file_type(target.name) != "video":
         abort(400, description="Endpoint supports video files only")
 
-    return jsonify(get_video_info(target))
+    return jsonify(get_video_info(target, stats=target_stat))
 
-@web.get("/get_adjacent_file")
+@api.get("/get_adjacent_file")
 @require_pin
 def adjacent_file():
     remote_hub = active_remote_hub()
@@ -518,21 +753,22 @@ def adjacent_file():
         abort(400, description="Direction must be 'next' or 'prev'")
 
     current_file = _resolve_or_400(request.args.get("path"))
-    if not current_file.exists() or not current_file.is_file():
-        abort(404, description="Current file not found")
+    _stat_file_or_404(current_file, "Current file not found")
 
     try:
-        sibling = get_adjacent_file(_root_dir(), current_file, direction)
+        sibling_entry = get_adjacent_entry(configured_root_dir(), current_file, direction)
     except FileNotFoundError as exc:
         abort(404, description=str(exc))
     except PermissionError:
         abort(403, description="Permission denied")
 
+    sibling = Path(sibling_entry.path)
     try:
-        stat = sibling.stat()
-        size = stat.st_size
-        mtime = stat.st_mtime
-        ctime = stat.st_ctime
+        # Served from the scandir result where the platform provides it (Windows).
+        sibling_stat = sibling_entry.stat()
+        size = sibling_stat.st_size
+        mtime = sibling_stat.st_mtime
+        ctime = sibling_stat.st_ctime
     except OSError:
         size = 0
         mtime = 0
@@ -541,8 +777,8 @@ def adjacent_file():
     return jsonify({
         "name": sibling.name,
         "is_dir": False,
-        "path": to_client_path(sibling, _root_dir()),
-        "parent_path": to_client_path(sibling.parent, _root_dir()),
+        "path": to_client_path(sibling, configured_root_dir()),
+        "parent_path": to_client_path(sibling.parent, configured_root_dir()),
         "type": get_file_type(sibling.name),
         "size": size,
         "modified_at": mtime,
@@ -550,7 +786,7 @@ def adjacent_file():
     })
 
 
-@web.get("/thumbnail")
+@api.get("/thumbnail")
 @require_pin
 def thumbnail():
     remote_hub = active_remote_hub()
@@ -563,53 +799,53 @@ def thumbnail():
         )
 
     target = _resolve_or_400(request.args.get("path"))
-    if not target.exists():
+    try:
+        target_stat = target.stat()
+    except OSError:
         abort(404)
 
-    size = current_app.config.get("THUMBNAIL_SIZE", (220, 220))
-    if target.is_dir():
-        try:
-            thumbnail_bytes = generate_cached_thumbnail_bytes(target, "directory", size)
-        except (FileNotFoundError, PermissionError, OSError):
-            abort(404)
-        return send_file(io.BytesIO(thumbnail_bytes), mimetype="image/jpeg", max_age=900)
+    size = current_app.extensions[_THUMBNAIL_SIZE_EXTENSION]
+    if stat.S_ISDIR(target_stat.st_mode):
+        return _thumbnail_response(
+            target_stat,
+            size,
+            lambda: generate_cached_thumbnail(target, "directory", size, stats=target_stat),
+        )
 
-    if not target.is_file():
+    if not stat.S_ISREG(target_stat.st_mode):
         abort(404)
 
     file_type = get_file_type(target.name)
     if file_type == "svg":
-        return send_file(target, mimetype="image/svg+xml", conditional=True, etag=True, max_age=900)
-
-    try:
-        if file_type == "image":
-            thumbnail_bytes = generate_thumbnail_bytes(target, size)
-        else:
-            thumbnail_bytes = generate_cached_thumbnail_bytes(target, file_type, size)
-    except (FileNotFoundError, PermissionError, OSError):
-        abort(404)
-
-    return send_file(io.BytesIO(thumbnail_bytes), mimetype="image/jpeg", max_age=900)
+        return send_file(target, mimetype="image/svg+xml", conditional=True, etag=True, max_age=THUMBNAIL_MAX_AGE_SECONDS)
+
+    if file_type == "image":
+        return _thumbnail_response(target_stat, size, lambda: (generate_thumbnail_bytes(target, size, stats=target_stat), False))
+    return _thumbnail_response(
+        target_stat,
+        size,
+        lambda: generate_cached_thumbnail(target, file_type, size, stats=target_stat),
+    )
 
 
 @web.route("/login", methods=["GET", "POST"])
 def login():
-    if not _is_setup_complete():
-        return redirect(url_for("web.setup"))
+    if not is_setup_complete():
+        return redirect(endpoint_url("web.setup"))
 
     if session.get("authenticated"):
-        return redirect(url_for("web.index"))
+        return redirect(endpoint_url("web.index"))
 
     setup_done = request.args.get("setup") == "done"
     if request.method == "POST":
         submitted_pin = request.form.get("pin", "")
-        if submitted_pin == current_app.config["PIN"]:
+        if pin_matches(submitted_pin):
             session["authenticated"] = True
             reset_active_hub()
             next_path = request.args.get("next")
             if next_path and next_path.startswith("/"):
                 return redirect(next_path)
-            return redirect(url_for("web.index"))
+            return redirect(endpoint_url("web.index"))
         return render_template("login.html", error="Invalid PIN", setup_done=setup_done), 401
 
     return render_template("login.html", error=None, setup_done=setup_done)
@@ -619,4 +855,4 @@ def login():
 def logout():
     clear_browser_hub_clients()
     session.clear()
-    return redirect(url_for("web.login"))
+    return redirect(endpoint_url("web.login"))
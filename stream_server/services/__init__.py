@@ -1,4 +1,5 @@
 from .file_service import (
+    generate_cached_thumbnail,
     generate_cached_thumbnail_bytes,
     generate_file_thumbnail_bytes,
     generate_placeholder_thumbnail_bytes,
@@ -6,6 +7,8 @@ from .file_service import (
     generate_text_thumbnail_bytes,
     generate_thumbnail_bytes,
     generate_video_thumbnail_bytes,
+    generate_video_thumbnails_batch,
+    get_adjacent_entry,
     get_adjacent_file,
     get_file_type,
     guess_mimetype,
@@ -14,9 +17,12 @@ from .file_service import (
     resolve_requested_path,
     search_entries,
     to_client_path,
+    warm_h264_encoder,
+    warm_placeholder_thumbnails,
 )
 
 __all__ = [
+    "generate_cached_thumbnail",
     "generate_cached_thumbnail_bytes",
     "generate_file_thumbnail_bytes",
     "generate_placeholder_thumbnail_bytes",
@@ -24,6 +30,8 @@ __all__ = [
     "generate_text_thumbnail_bytes",
     "generate_thumbnail_bytes",
     "generate_video_thumbnail_bytes",
+    "generate_video_thumbnails_batch",
+    "get_adjacent_entry",
     "get_adjacent_file",
     "get_file_type",
     "guess_mimetype",
@@ -32,4 +40,6 @@ __all__ = [
     "resolve_requested_path",
     "search_entries",
     "to_client_path",
+    "warm_h264_encoder",
+    "warm_placeholder_thumbnails",
 ]
@@ -5,20 +5,22 @@ import heapq
 import hashlib
 import mimetypes
 import os
-import re
 import shutil
 import subprocess
 import tempfile
 import threading
 import time
-from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from collections import OrderedDict
+from functools import lru_cache, wraps
 from pathlib import Path, PurePosixPath, PureWindowsPath
-from typing import Any
+from typing import Any, Callable
 
 from PIL import Image, ImageDraw, ImageFont, ImageOps, UnidentifiedImageError
 
 
 from .file_service_catalog import (
+    get_adjacent_entry,
     get_adjacent_file,
     get_file_type,
     guess_mimetype,
@@ -30,15 +32,29 @@ from .file_service_catalog import (
 THUMBNAIL_MIN_EDGE = 64
 THUMBNAIL_MAX_EDGE = 512
 TEXT_THUMBNAIL_MAX_BYTES = 16 * 1024
+TEXT_THUMBNAIL_READ_CHUNK_BYTES = 2 * 1024
 TEXT_THUMBNAIL_MAX_LINES = 9
 TEXT_THUMBNAIL_MAX_LINE_CHARS = 34
+TEXT_THUMBNAIL_LINE_PITCH = 12
 STREAM_CHUNK_BYTES = 64 * 1024
-THUMBNAIL_CACHE_VERSION = 3
+IMAGE_THUMBNAIL_PASSTHROUGH_MAX_BYTES = 64 * 1024
+THUMBNAIL_JPEG_QUALITY = 82
+TRANSCODE_PIPE_BYTES = 1024 * 1024
+TRANSCODE_READ_CHUNK_BYTES = 256 * 1024
+PDF_THUMBNAIL_MAX_ZOOM = 1.5
+THUMBNAIL_CACHE_VERSION = 4
 THUMBNAIL_DEFAULT_CACHE_TTL_SECONDS = 30 * 60
 THUMBNAIL_DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
 THUMBNAIL_CACHE_PRUNE_INTERVAL_SECONDS = 5 * 60
+THUMBNAIL_DEFAULT_MEMORY_MAX_BYTES = 32 * 1024 * 1024
 THUMBNAIL_GENERATION_DEFAULT_CONCURRENCY = max(2, min(6, os.cpu_count() or 2))
-THUMBNAIL_GENERATION_ACQUIRE_TIMEOUT_SECONDS = 0.08
+THUMBNAIL_GENERATION_DEFAULT_MAX_QUEUED = 64
+THUMBNAIL_GENERATION_WAIT_SECONDS = 20.0
+VIDEO_THUMBNAIL_TIMEOUT_SECONDS = 15
+VIDEO_THUMBNAIL_BATCH_WINDOW_SECONDS = 0.05
+VIDEO_THUMBNAIL_BATCH_MAX_INPUTS = 8
+VIDEO_THUMBNAIL_BATCH_DECODE_SECONDS = 5
+TRANSCODE_ENCODER_PROBE_TIMEOUT_SECONDS = 10
 
 _THUMBNAIL_LABELS = {
     "directory": "DIR",
@@ -69,7 +85,24 @@ _THUMBNAIL_COLORS = {
     "text": ((154, 164, 177), (118, 128, 141), (66, 72, 79)),
     "other": ((124, 133, 143), (93, 100, 110), (46, 50, 55)),
 }
+_EXIF_ORIENTATION_TAG = 0x0112
 _TEXT_THUMBNAIL_TYPES = {"code", "text", "markdown", "html"}
+_TEXT_THUMBNAIL_BACKGROUNDS = {
+    "markdown": (35, 36, 48),
+    "html": (43, 28, 19),
+}
+_TEXT_THUMBNAIL_HEADER_COLORS = {
+    "code": (66, 99, 143),
+    "text": (86, 95, 108),
+    "markdown": (126, 98, 164),
+    "html": (166, 104, 62),
+}
+_TEXT_THUMBNAIL_CONTROL_BYTES = bytes([*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20)])
+
+try:  # POSIX only: used to enlarge the transcode pipe on Linux.
+    import fcntl
+except Exception:  # noqa: BLE001
+    fcntl = None
 
 try:  # Optional dependency: if available, render first PDF page thumbnails.
     import fitz  # type: ignore[import-not-found]
@@ -93,8 +126,15 @@ def _initial_thumbnail_concurrency() -> int:
     return max(1, min(parsed, 16))
 
 
-_thumbnail_generation_sem = threading.BoundedSemaphore(_initial_thumbnail_concurrency())
+_thumbnail_generation_executor = ThreadPoolExecutor(
+    max_workers=_initial_thumbnail_concurrency(),
+    thread_name_prefix="heavy-thumbnail",
+)
+_thumbnail_generation_lock = threading.Lock()
+_thumbnail_generation_pending = 0
+_image_thumbnail_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix="image-thumbnail")
 _thumbnail_cache_prune_lock = threading.Lock()
+_O_TMPFILE = getattr(os, "O_TMPFILE", None)  # Linux only; elsewhere cache writes go through a .tmp rename.
 _thumbnail_cache_last_prune = 0.0
 
 
@@ -114,7 +154,22 @@ def _thumbnail_label(file_type: str, custom_label: str | None = None) -> str:
 
 
 def _resolve_ffmpeg_bin() -> str | None:
-    env_path = os.environ.get("STREAM_FFMPEG_BIN", "").strip()
+    return _locate_ffmpeg_bin(os.environ.get("STREAM_FFMPEG_BIN", "").strip())
+
+
+def _resolve_ffprobe_bin() -> str | None:
+    ffmpeg_bin = _resolve_ffmpeg_bin()
+    return _ffprobe_bin_for(ffmpeg_bin) if ffmpeg_bin else None
+
+
+@lru_cache(maxsize=4)
+def _ffprobe_bin_for(ffmpeg_bin: str) -> str:
+    return ffmpeg_bin.replace("ffmpeg", "ffprobe")
+
+
+@lru_cache(maxsize=2)
+def _locate_ffmpeg_bin(env_path: str) -> str | None:
+    # Keyed on STREAM_FFMPEG_BIN so an override still applies; the PATH search runs once per process.
     if env_path:
         return env_path
 
@@ -160,13 +215,15 @@ def _env_bool(name: str, default: bool) -> bool:
 
 
 def _thumbnail_cache_dir() -> Path:
-    raw = os.environ.get("STREAM_THUMBNAIL_CACHE_DIR", "").strip()
+    return _thumbnail_cache_dir_for(os.environ.get("STREAM_THUMBNAIL_CACHE_DIR", "").strip())
+
+
+@lru_cache(maxsize=4)
+def _thumbnail_cache_dir_for(raw: str) -> Path:
+    # Created on first write (_write_cached_thumbnail makes the bucket with parents=True), not per lookup.
     if raw:
-        cache_dir = Path(raw).expanduser()
-    else:
-        cache_dir = Path(tempfile.gettempdir()) / "StreamLocalFiles" / "thumb-cache"
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    return cache_dir
+        return Path(raw).expanduser()
+    return Path(tempfile.gettempdir()) / "StreamLocalFiles" / "thumb-cache"
 
 
 def _thumbnail_cache_ttl_seconds() -> int:
@@ -183,34 +240,234 @@ def _thumbnail_cache_max_bytes() -> int:
     return max_mb * 1024 * 1024
 
 
-def _thumbnail_cache_path(target: Path, file_type: str, width: int, height: int) -> Path:
+def _thumbnail_memory_max_bytes() -> int:
+    max_mb = _env_int("STREAM_THUMBNAIL_MEM_MAX_MB", THUMBNAIL_DEFAULT_MEMORY_MAX_BYTES // (1024 * 1024), minimum=4, maximum=1024)
+    return max_mb * 1024 * 1024
+
+
+class _ThumbnailMemoryCache:
+    """One LRU of rendered thumbnails for every generator, bounded by total bytes rather than entry count."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[Any, ...], bytes] = OrderedDict()
+        self._total_bytes = 0
+
+    def get_or_compute(self, key: tuple[Any, ...], factory: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                return payload
+
+        payload = factory()
+        max_bytes = _thumbnail_memory_max_bytes()
+        if len(payload) > max_bytes:
+            return payload
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= len(previous)
+            self._entries[key] = payload
+            self._total_bytes += len(payload)
+            while self._total_bytes > max_bytes:
+                _evicted_key, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted)
+        return payload
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+
+_thumbnail_memory_cache = _ThumbnailMemoryCache()
+
+
+def _memory_cached(function: Callable[..., bytes]) -> Callable[..., bytes]:
+    @wraps(function)
+    def wrapper(*args: Any) -> bytes:
+        return _thumbnail_memory_cache.get_or_compute((function.__name__, *args), lambda: function(*args))
+
+    return wrapper
+
+
+def _thumbnail_cache_path(
+    target: Path,
+    file_type: str,
+    width: int,
+    height: int,
+    *,
+    stats: os.stat_result | None = None,
+) -> Path:
     try:
-        stats = target.stat()
-        stat_signature = f"{stats.st_size}:{stats.st_mtime_ns}"
+        if stats is None:
+            stats = target.stat()
+        # Device and inode pin down the file behind any symlinks without resolving the path.
+        stat_signature = f"{stats.st_dev}:{stats.st_ino}:{stats.st_size}:{stats.st_mtime_ns}"
     except OSError:
         stat_signature = "na"
-    key_raw = f"{THUMBNAIL_CACHE_VERSION}|{target.resolve()}|{file_type}|{width}x{height}|{stat_signature}"
-    digest = hashlib.sha256(key_raw.encode("utf-8", errors="ignore")).hexdigest()
-    cache_dir = _thumbnail_cache_dir() / digest[:2]
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    return cache_dir / f"{digest}.jpg"
+    key_raw = f"{THUMBNAIL_CACHE_VERSION}|{os.path.abspath(target)}|{file_type}|{width}x{height}|{stat_signature}"
+    digest = hashlib.blake2s(key_raw.encode("utf-8", errors="ignore"), digest_size=16).hexdigest()
+    return _thumbnail_cache_dir() / digest[:2] / f"{digest}.jpg"
 
 
-def _read_cached_thumbnail(cache_path: Path, ttl_seconds: int) -> bytes | None:
-    if not cache_path.exists():
-        return None
+class _ThumbnailCacheIndex:
+    """Write time, last access and size of every cached thumbnail, so pruning needs no directory scan.
+
+    Seeded from disk the first time a cache directory is pruned, then kept current by reads and writes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._root: str | None = None
+        self._entries: dict[str, tuple[float, float, int]] = {}
+
+    def _ensure_seeded(self, root: Path) -> None:
+        root_key = str(root)
+        if self._root == root_key:
+            return
+        entries: dict[str, tuple[float, float, int]] = {}
+        pending = [root_key]
+        while pending:
+            try:
+                with os.scandir(pending.pop()) as iterator:
+                    for entry in iterator:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                            continue
+                        if not entry.name.endswith(".jpg"):
+                            continue
+                        try:
+                            stat = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        # Hard-linked entries are placeholders sharing one inode; they add nothing to the budget.
+                        size = stat.st_size if stat.st_nlink <= 1 else 0
+                        entries[entry.path] = (stat.st_mtime, stat.st_mtime, size)
+            except OSError:
+                continue
+        self._root = root_key
+        self._entries = entries
+
+    def record_write(self, cache_path: Path, size: int, now: float) -> None:
+        with self._lock:
+            if self._root is not None:
+                self._entries[str(cache_path)] = (now, now, size)
+
+    def record_access(self, cache_path: Path, now: float) -> None:
+        key = str(cache_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], now, entry[2])
+
+    def discard(self, cache_path: Path) -> None:
+        with self._lock:
+            self._entries.pop(str(cache_path), None)
+
+    def take_prune_victims(self, root: Path, now: float, ttl_seconds: int, max_bytes: int) -> list[str]:
+        """Drop expired entries, then least recently used ones until under max_bytes; return their paths."""
+        with self._lock:
+            self._ensure_seeded(root)
+            stale_before = now - ttl_seconds
+            victims = [path for path, (written_at, _accessed_at, _size) in self._entries.items() if written_at < stale_before]
+            for path in victims:
+                del self._entries[path]
+
+            total_size = sum(size for _written_at, _accessed_at, size in self._entries.values())
+            if total_size > max_bytes:
+                by_access = [(accessed_at, path) for path, (_written_at, accessed_at, _size) in self._entries.items()]
+                heapq.heapify(by_access)
+                while by_access and total_size > max_bytes:
+                    _accessed_at, path = heapq.heappop(by_access)
+                    total_size -= self._entries.pop(path)[2]
+                    victims.append(path)
+            return victims
+
+
+_thumbnail_cache_index = _ThumbnailCacheIndex()
+
+
+def _read_cached_thumbnail(
+    cache_path: Path,
+    ttl_seconds: int,
+    placeholder: Callable[[], bytes] | None = None,
+) -> bytes | None:
+    # open + fstat + read: a miss costs one failed open, a hit never looks the path up twice. Hot entries
+    # (a page being scrolled back and forth) skip the read and copy via the memory LRU; the key carries
+    # the mtime, so a rewritten entry is never served stale and the TTL check still runs on every hit.
+    # This is the only memory layer for disk-cached thumbnails, so each one is held once.
     try:
-        now = time.time()
-        age_seconds = now - cache_path.stat().st_mtime
-        if age_seconds > ttl_seconds:
+        with open(cache_path, "rb", buffering=0) as handle:
+            now = time.time()
+            stat = os.fstat(handle.fileno())
+            expired = now - stat.st_mtime > ttl_seconds
+            if expired:
+                payload = b""
+            elif stat.st_nlink > 1 and placeholder is not None:
+                # A link to the shared placeholder copy: its bytes are already in memory once per type and
+                # size, rather than once per file linked to it.
+                payload = placeholder()
+            else:
+                payload = _thumbnail_memory_cache.get_or_compute(
+                    ("_read_cached_thumbnail", str(cache_path), stat.st_mtime_ns),
+                    handle.read,
+                )
+        if expired:
             cache_path.unlink(missing_ok=True)
+            _thumbnail_cache_index.discard(cache_path)
             return None
-        return cache_path.read_bytes()
     except OSError:
         return None
+    _thumbnail_cache_index.record_access(cache_path, now)
+    return payload
+
+
+def _link_anonymous_file(cache_path: Path, payload: bytes) -> bool:
+    """Write payload to an unnamed O_TMPFILE inode and link it in place; False if the platform can't.
+
+    Both calls go through an fd for the bucket directory: os.link() only issues
+    linkat(AT_SYMLINK_FOLLOW), which the /proc/self/fd source needs, when a dir fd is passed. The fd is
+    opened per write (writes only happen on misses), so a deleted bucket or a failed link never leaves
+    a stale or leaked descriptor behind.
+    """
+    if _O_TMPFILE is None:
+        return False
+    try:
+        dir_fd = os.open(cache_path.parent, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return False
+    try:
+        try:
+            fd = os.open(".", _O_TMPFILE | os.O_WRONLY, 0o644, dir_fd=dir_fd)
+        except OSError:
+            return False
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            os.link(f"/proc/self/fd/{fd}", cache_path.name, dst_dir_fd=dir_fd)
+        except FileExistsError:
+            return True  # A concurrent miss for the same key already published identical bytes.
+        except OSError:
+            return False
+        finally:
+            os.close(fd)
+    finally:
+        os.close(dir_fd)
+    return True
 
 
 def _write_cached_thumbnail(cache_path: Path, payload: bytes) -> None:
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return
+    if _link_anonymous_file(cache_path, payload):
+        _thumbnail_cache_index.record_write(cache_path, len(payload), time.time())
+        return
+
     temp_path = cache_path.with_suffix(cache_path.suffix + ".tmp")
     try:
         temp_path.write_bytes(payload)
@@ -220,6 +477,42 @@ def _write_cached_thumbnail(cache_path: Path, payload: bytes) -> None:
             temp_path.unlink(missing_ok=True)
         except OSError:
             pass
+        return
+    _thumbnail_cache_index.record_write(cache_path, len(payload), time.time())
+
+
+def _link_placeholder_thumbnail(cache_path: Path, payload: bytes) -> None:
+    """Cache a placeholder as a hard link to one shared copy of its bytes instead of a file of its own.
+
+    A folder of documents would otherwise store the same few kilobytes once per file. The shared copy
+    is not a .jpg, so the index never tracks or prunes it; the links are tracked at zero bytes.
+
+    Links share the inode's mtime, which the TTL check on read, index seeding and the memory-cache key
+    all use, so that mtime is never touched. Instead the shared copy is replaced by a fresh inode once
+    it is half a TTL old: new links start a new generation and existing ones keep aging on the old one,
+    so every link expires between half a TTL and a full TTL after it was written.
+    """
+    digest = hashlib.blake2s(payload, digest_size=16).hexdigest()
+    canonical_path = _thumbnail_cache_dir() / "_placeholders" / f"{digest}.placeholder"
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            stale = time.time() - os.stat(canonical_path).st_mtime > _thumbnail_cache_ttl_seconds() / 2
+        except FileNotFoundError:
+            stale = True
+        if stale:
+            canonical_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = canonical_path.with_suffix(f".{threading.get_ident()}.tmp")
+            temp_path.write_bytes(payload)
+            temp_path.replace(canonical_path)
+        try:
+            os.link(canonical_path, cache_path)
+        except FileExistsError:
+            pass  # A concurrent miss for the same key got there first.
+    except OSError:
+        _write_cached_thumbnail(cache_path, payload)
+        return
+    _thumbnail_cache_index.record_write(cache_path, 0, time.time())
 
 
 def _prune_thumbnail_cache(ttl_seconds: int, max_bytes: int) -> None:
@@ -233,67 +526,85 @@ def _prune_thumbnail_cache(ttl_seconds: int, max_bytes: int) -> None:
             return
         _thumbnail_cache_last_prune = now
 
-        root = _thumbnail_cache_dir()
-        files: list[tuple[float, int, Path]] = []
-        total_size = 0
-        stale_before = now - ttl_seconds
-
-        for child in root.rglob("*.jpg"):
-            try:
-                stat = child.stat()
-            except OSError:
-                continue
-            if stat.st_mtime < stale_before:
-                try:
-                    child.unlink(missing_ok=True)
-                except OSError:
-                    pass
-                continue
-            files.append((stat.st_mtime, stat.st_size, child))
-            total_size += stat.st_size
-
-        if total_size <= max_bytes:
-            return
-
-        files.sort(key=lambda row: row[0])  # oldest first
-        for _mtime, size, path in files:
+        for victim in _thumbnail_cache_index.take_prune_victims(_thumbnail_cache_dir(), now, ttl_seconds, max_bytes):
             try:
-                path.unlink(missing_ok=True)
+                os.unlink(victim)
             except OSError:
-                continue
-            total_size -= size
-            if total_size <= max_bytes:
-                break
+                pass
 
 
 def _video_thumbnails_enabled() -> bool:
     return _env_bool("STREAM_ENABLE_VIDEO_THUMBNAILS", True)
 
 
-@lru_cache(maxsize=384)
+@_memory_cached
 def _image_thumbnail_cache(path_key: str, mtime_ns: int, width: int, height: int) -> bytes:
     del mtime_ns
+    # Request threads far outnumber cores; decode on a core-sized pool (Pillow drops the GIL inside codecs).
+    return _image_thumbnail_executor.submit(_render_image_thumbnail, path_key, width, height).result()
+
+
+def _encode_jpeg(image: Image.Image) -> bytes:
+    # No optimize=True: the extra Huffman pass roughly doubles encode time for a few percent on thumbnails.
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=THUMBNAIL_JPEG_QUALITY)
+    return output.getvalue()
+
+
+def _render_image_thumbnail(path_key: str, width: int, height: int) -> bytes:
     with Image.open(path_key) as image:
+        # Image.open only parses headers; a small upright JPEG that already fits is served as-is.
+        if _can_pass_through_jpeg(image, width, height) and os.path.getsize(path_key) <= IMAGE_THUMBNAIL_PASSTHROUGH_MAX_BYTES:
+            with open(path_key, "rb") as handle:
+                return handle.read()
+        # Let libjpeg scale down while decoding (no-op for other formats). exif_transpose copies the image,
+        # which would otherwise force a full-resolution decode; 2x keeps thumbnail()'s reducing_gap quality.
+        # Square request because the EXIF rotation may still swap the axes.
+        draft_side = 2 * max(width, height)
+        image.draft("RGB", (draft_side, draft_side))
         image = ImageOps.exif_transpose(image)
-        image.thumbnail((width, height))
+        # From at most 2x the target, bilinear is indistinguishable from the bicubic default and cheaper.
+        image.thumbnail((width, height), Image.Resampling.BILINEAR)
         if image.mode not in ("RGB", "L"):
             image = image.convert("RGB")
-        output = io.BytesIO()
-        image.save(output, format="JPEG", quality=82, optimize=True)
-        return output.getvalue()
+        return _encode_jpeg(image)
 
 
-@lru_cache(maxsize=192)
-def _video_thumbnail_cache(path_key: str, mtime_ns: int, size_bytes: int, width: int, height: int) -> bytes:
-    del mtime_ns, size_bytes
-    ffmpeg_bin = _resolve_ffmpeg_bin()
-    if not ffmpeg_bin:
+def _can_pass_through_jpeg(image: Image.Image, width: int, height: int) -> bool:
+    if image.format != "JPEG" or image.mode not in ("RGB", "L"):
+        return False
+    if image.width > width or image.height > height:
+        return False
+    return image.getexif().get(_EXIF_ORIENTATION_TAG, 1) == 1
+
+
+def _video_thumbnail(path_key: str, width: int, height: int) -> bytes:
+    if not _resolve_ffmpeg_bin():
         raise FileNotFoundError("ffmpeg not available")
+    return _video_thumbnail_batcher.render(path_key, width, height)
+
 
-    vf = (
+@lru_cache(maxsize=64)
+def _video_thumbnail_filter(width: int, height: int) -> str:
+    return (
         f"thumbnail=120,scale={width}:{height}:force_original_aspect_ratio=decrease,"
         f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black"
     )
+
+
+def _encode_video_frame(frame: bytes, width: int, height: int) -> bytes:
+    with Image.open(io.BytesIO(frame)) as image:
+        image.thumbnail((width, height))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        return _encode_jpeg(image)
+
+
+def _render_video_thumbnail(path_key: str, width: int, height: int) -> bytes:
+    ffmpeg_bin = _resolve_ffmpeg_bin()
+    if not ffmpeg_bin:
+        raise FileNotFoundError("ffmpeg not available")
+
     command = [
         ffmpeg_bin,
         "-hide_banner",
@@ -302,7 +613,7 @@ def _video_thumbnail_cache(path_key: str, mtime_ns: int, size_bytes: int, width:
         "-i",
         path_key,
         "-vf",
-        vf,
+        _video_thumbnail_filter(width, height),
         "-frames:v",
         "1",
         "-f",
@@ -316,23 +627,137 @@ def _video_thumbnail_cache(path_key: str, mtime_ns: int, size_bytes: int, width:
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         check=False,
-        timeout=15,
+        timeout=VIDEO_THUMBNAIL_TIMEOUT_SECONDS,
     )
     if completed.returncode != 0 or not completed.stdout:
         raise OSError("Unable to extract video frame thumbnail")
+    return _encode_video_frame(completed.stdout, width, height)
 
-    with Image.open(io.BytesIO(completed.stdout)) as image:
-        image.thumbnail((width, height))
-        if image.mode not in ("RGB", "L"):
-            image = image.convert("RGB")
-        output = io.BytesIO()
-        image.save(output, format="JPEG", quality=82, optimize=True)
-        return output.getvalue()
 
+def generate_video_thumbnails_batch(requests: list[tuple[Path, tuple[int, int]]]) -> list[bytes | None]:
+    """Extract one thumbnail per (video, size) pair with a single ffmpeg process.
 
-@lru_cache(maxsize=96)
-def _pdf_thumbnail_cache(path_key: str, mtime_ns: int, width: int, height: int) -> bytes:
-    del mtime_ns
+    ffmpeg fails the whole graph if any input is unreadable, so every slot is None on failure;
+    callers fall back to per-file extraction for those.
+    """
+    if not requests:
+        return []
+    ffmpeg_bin = _resolve_ffmpeg_bin()
+    if not ffmpeg_bin:
+        raise FileNotFoundError("ffmpeg not available")
+
+    sizes = [_normalize_thumbnail_size(size) for _path, size in requests]
+    with tempfile.TemporaryDirectory(prefix="omni-stream-thumbs-") as temp_dir:
+        command = [ffmpeg_bin, "-hide_banner", "-loglevel", "error", "-y"]
+        for video_path, _size in requests:
+            command.extend(["-i", str(video_path)])
+        command.extend([
+            "-filter_complex",
+            ";".join(f"[{index}:v]{_video_thumbnail_filter(width, height)}[t{index}]" for index, (width, height) in enumerate(sizes)),
+        ])
+        outputs = [os.path.join(temp_dir, f"thumb{index}.jpg") for index in range(len(requests))]
+        for index, output_path in enumerate(outputs):
+            command.extend(["-map", f"[t{index}]", "-frames:v", "1", "-f", "image2", "-vcodec", "mjpeg", output_path])
+
+        try:
+            completed = subprocess.run(
+                command,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                check=False,
+                timeout=VIDEO_THUMBNAIL_TIMEOUT_SECONDS,
+            )
+        except subprocess.TimeoutExpired:
+            return [None] * len(requests)
+        if completed.returncode != 0:
+            return [None] * len(requests)
+
+        payloads: list[bytes | None] = []
+        for output_path, (width, height) in zip(outputs, sizes):
+            try:
+                with open(output_path, "rb") as handle:
+                    payloads.append(_encode_video_frame(handle.read(), width, height))
+            except (OSError, UnidentifiedImageError):
+                payloads.append(None)
+        return payloads
+
+
+class _VideoThumbnailBatcher:
+    """Coalesces video thumbnail misses that arrive within a short window into one ffmpeg run.
+
+    A miss that finds another video render queued or in flight waits out the window, then extracts
+    frames for everyone queued behind it; a lone miss renders straight away. Misses left alone in a
+    batch, or whose batch failed, fall back to render_one.
+    """
+
+    def __init__(self, window_seconds: float, max_inputs: int, render_one: Callable[[str, int, int], bytes]) -> None:
+        self._window_seconds = window_seconds
+        self._max_inputs = max_inputs
+        self._render_one = render_one
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, int, int, Future]] = []
+        self._in_flight = 0
+
+    def render(self, path_key: str, width: int, height: int) -> bytes:
+        future: Future = Future()
+        with self._lock:
+            position = len(self._pending)
+            self._pending.append((path_key, width, height, future))
+            busy = self._in_flight > 0
+            self._in_flight += 1
+        try:
+            if position == 0:
+                if busy:
+                    time.sleep(self._window_seconds)
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                self._run(batch)
+            # The leader runs its chunks one after another, each bounded by the ffmpeg timeout plus
+            # decoding the frames, so a follower's wait covers every chunk up to and including its own.
+            chunks_ahead = position // self._max_inputs + 1
+            chunk_seconds = VIDEO_THUMBNAIL_TIMEOUT_SECONDS + VIDEO_THUMBNAIL_BATCH_DECODE_SECONDS
+            try:
+                payload = future.result(timeout=self._window_seconds + chunks_ahead * chunk_seconds)
+            except Exception:  # noqa: BLE001
+                payload = None
+            if payload is None:
+                payload = self._render_one(path_key, width, height)
+            return payload
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _run(self, batch: list[tuple[str, int, int, Future]]) -> None:
+        try:
+            for start in range(0, len(batch), self._max_inputs):
+                chunk = batch[start:start + self._max_inputs]
+                if len(chunk) == 1:
+                    # Nothing to amortize; the caller runs the plain single-input command.
+                    chunk[0][3].set_result(None)
+                    continue
+                try:
+                    payloads = generate_video_thumbnails_batch(
+                        [(Path(path_key), (width, height)) for path_key, width, height, _future in chunk]
+                    )
+                except Exception:  # noqa: BLE001
+                    payloads = [None] * len(chunk)
+                for (_path_key, _width, _height, future), payload in zip(chunk, payloads):
+                    future.set_result(payload)
+        finally:
+            # Never leave a follower waiting out its whole budget on a leader that stopped early.
+            for _path_key, _width, _height, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+
+_video_thumbnail_batcher = _VideoThumbnailBatcher(
+    VIDEO_THUMBNAIL_BATCH_WINDOW_SECONDS,
+    VIDEO_THUMBNAIL_BATCH_MAX_INPUTS,
+    _render_video_thumbnail,
+)
+
+
+def _render_pdf_thumbnail(path_key: str, width: int, height: int) -> bytes:
     if fitz is None:
         raise FileNotFoundError("PDF thumbnail renderer not installed")
 
@@ -341,22 +766,36 @@ def _pdf_thumbnail_cache(path_key: str, mtime_ns: int, width: int, height: int)
         if document.page_count < 1:
             raise OSError("PDF has no pages")
         page = document.load_page(0)
-        matrix = fitz.Matrix(1.5, 1.5)
-        pixmap = page.get_pixmap(matrix=matrix, alpha=False)
-        image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+        # Rasterize straight at the thumbnail's size instead of at a fixed 1.5x of the page, which
+        # renders letter pages at ~920x1190 only to shrink them to a few hundred pixels.
+        page_width = max(1.0, page.rect.width)
+        page_height = max(1.0, page.rect.height)
+        zoom = min(PDF_THUMBNAIL_MAX_ZOOM, width / page_width, height / page_height)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+        if pixmap.width <= width and pixmap.height <= height:
+            # Already thumbnail-sized: let MuPDF encode the JPEG from its own buffer.
+            try:
+                return pixmap.tobytes("jpeg", jpg_quality=THUMBNAIL_JPEG_QUALITY)
+            except (TypeError, ValueError, RuntimeError):
+                pass  # PyMuPDF without JPEG output; encode through Pillow below.
+        # Wrap MuPDF's sample buffer instead of copying it into bytes first; the pixmap has to outlive
+        # the wrapping image, so it is only dropped once the thumbnail no longer points into it.
+        samples = getattr(pixmap, "samples_mv", None)
+        if samples is None:
+            samples = pixmap.samples
+        image = Image.frombuffer("RGB", (pixmap.width, pixmap.height), samples, "raw", "RGB", 0, 1)
+        try:
+            image.thumbnail((width, height))
+            return _encode_jpeg(image)
+        finally:
+            image.close()
+            samples = None
+            pixmap = None
     finally:
         document.close()
 
-    try:
-        image.thumbnail((width, height))
-        output = io.BytesIO()
-        image.save(output, format="JPEG", quality=82, optimize=True)
-        return output.getvalue()
-    finally:
-        image.close()
-
 
-@lru_cache(maxsize=512)
+@_memory_cached
 def _placeholder_thumbnail_cache(file_type: str, label: str, width: int, height: int) -> bytes:
     thumb_type = file_type if file_type in _THUMBNAIL_COLORS else "other"
     top_color, bottom_color, accent_color = _THUMBNAIL_COLORS[thumb_type]
@@ -378,7 +817,7 @@ def _placeholder_thumbnail_cache(file_type: str, label: str, width: int, height:
     )
 
     label_text = label[:8].upper()
-    font = ImageFont.load_default()
+    font = _thumbnail_font()
     if hasattr(draw, "textbbox"):
         left, top, right, bottom = draw.textbbox((0, 0), label_text, font=font)
         text_w = right - left
@@ -389,21 +828,37 @@ def _placeholder_thumbnail_cache(file_type: str, label: str, width: int, height:
     text_y = max(0, (height - text_h) // 2)
     draw.text((text_x, text_y), label_text, fill=(244, 247, 250), font=font)
 
-    output = io.BytesIO()
-    image.save(output, format="JPEG", quality=82, optimize=True)
-    image.close()
-    return output.getvalue()
-
-
-def _strip_controls(value: str) -> str:
-    return re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f]", "", value)
+    try:
+        return _encode_jpeg(image)
+    finally:
+        image.close()
 
 
 def _read_text_thumbnail_snippet(path: Path) -> str:
-    with path.open("rb") as file_obj:
-        raw = file_obj.read(TEXT_THUMBNAIL_MAX_BYTES + 1)
-    decoded = raw.decode("utf-8", errors="replace")
-    cleaned = _strip_controls(decoded)
+    # Read in small chunks and stop once enough non-empty lines are complete; typical source files never
+    # get near the byte cap. Cutting right after a newline keeps the decode and split below unchanged.
+    buffer = bytearray()
+    remaining = TEXT_THUMBNAIL_MAX_BYTES + 1
+    complete_lines = 0
+    scanned = 0
+    with path.open("rb", buffering=0) as file_obj:
+        while remaining > 0 and complete_lines < TEXT_THUMBNAIL_MAX_LINES:
+            chunk = file_obj.read(min(TEXT_THUMBNAIL_READ_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            # ASCII control bytes never occur inside a multi-byte UTF-8 sequence, so they can go before decoding.
+            buffer += chunk.translate(None, _TEXT_THUMBNAIL_CONTROL_BYTES)
+            while complete_lines < TEXT_THUMBNAIL_MAX_LINES:
+                newline = buffer.find(b"\n", scanned)
+                if newline < 0:
+                    break
+                if buffer[scanned:newline].strip(b"\r"):
+                    complete_lines += 1
+                scanned = newline + 1
+    if complete_lines >= TEXT_THUMBNAIL_MAX_LINES:
+        del buffer[scanned:]
+    cleaned = buffer.decode("utf-8", errors="replace")
     lines = []
     for line in cleaned.splitlines():
         trimmed = line.strip("\r\n")
@@ -415,43 +870,58 @@ def _read_text_thumbnail_snippet(path: Path) -> str:
     return "\n".join(lines)
 
 
-@lru_cache(maxsize=320)
-def _text_thumbnail_cache(path_key: str, mtime_ns: int, size_bytes: int, file_type: str, width: int, height: int) -> bytes:
-    del mtime_ns, size_bytes
-    snippet = _read_text_thumbnail_snippet(Path(path_key))
-    if not snippet:
-        return _placeholder_thumbnail_cache(file_type, _thumbnail_label(file_type), width, height)
+@lru_cache(maxsize=1)
+def _thumbnail_font() -> ImageFont.ImageFont | ImageFont.FreeTypeFont:
+    # Pillow >= 10.1 loads a FreeType font here, which is far from free to repeat per thumbnail.
+    return ImageFont.load_default()
+
 
-    bg = (17, 24, 39)
-    if file_type == "markdown":
-        bg = (35, 36, 48)
-    elif file_type == "html":
-        bg = (43, 28, 19)
+@lru_cache(maxsize=1)
+def _text_thumbnail_line_spacing() -> int:
+    # multiline_text() advances by the height of "A" plus spacing; keep the fixed pitch text thumbnails use.
+    probe = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    return TEXT_THUMBNAIL_LINE_PITCH - probe.textbbox((0, 0), "A", font=_thumbnail_font())[3]
+
+
+@lru_cache(maxsize=64)
+def _text_thumbnail_backdrop(file_type: str, width: int, height: int) -> tuple[Image.Image, int]:
+    """Background and header bar shared by every text thumbnail of one type and size; callers copy() it."""
+    bg = _TEXT_THUMBNAIL_BACKGROUNDS.get(file_type, (17, 24, 39))
     image = Image.new("RGB", (width, height), color=bg)
     draw = ImageDraw.Draw(image)
-    font = ImageFont.load_default()
 
     header_h = max(18, height // 7)
-    header_color = {
-        "code": (66, 99, 143),
-        "text": (86, 95, 108),
-        "markdown": (126, 98, 164),
-        "html": (166, 104, 62),
-    }.get(file_type, (86, 95, 108))
+    header_color = _TEXT_THUMBNAIL_HEADER_COLORS.get(file_type, (86, 95, 108))
     draw.rectangle((0, 0, width, header_h), fill=header_color)
-    draw.text((8, max(2, (header_h - 10) // 2)), _thumbnail_label(file_type), fill=(242, 246, 251), font=font)
+    draw.text((8, max(2, (header_h - 10) // 2)), _thumbnail_label(file_type), fill=(242, 246, 251), font=_thumbnail_font())
+    return image, header_h
 
-    y = header_h + 6
-    for line in snippet.splitlines():
-        if y > height - 12:
-            break
-        draw.text((8, y), line, fill=(218, 226, 236), font=font)
-        y += 12
 
-    output = io.BytesIO()
-    image.save(output, format="JPEG", quality=82, optimize=True)
-    image.close()
-    return output.getvalue()
+def _render_text_thumbnail(path_key: str, file_type: str, width: int, height: int) -> bytes:
+    snippet = _read_text_thumbnail_snippet(Path(path_key))
+    if not snippet:
+        return _placeholder_thumbnail_cache(file_type, _thumbnail_label(file_type), width, height)
+
+    backdrop, header_h = _text_thumbnail_backdrop(file_type, width, height)
+    image = backdrop.copy()
+    draw = ImageDraw.Draw(image)
+    font = _thumbnail_font()
+
+    top = header_h + 6
+    visible_lines = max(0, (height - 12 - top) // TEXT_THUMBNAIL_LINE_PITCH + 1)
+    if visible_lines:
+        draw.multiline_text(
+            (8, top),
+            "\n".join(snippet.splitlines()[:visible_lines]),
+            fill=(218, 226, 236),
+            font=font,
+            spacing=_text_thumbnail_line_spacing(),
+        )
+
+    try:
+        return _encode_jpeg(image)
+    finally:
+        image.close()
 
 
 def generate_placeholder_thumbnail_bytes(file_type: str, size: tuple[int, int], *, label: str | None = None) -> bytes:
@@ -465,23 +935,24 @@ def generate_placeholder_thumbnail_bytes(file_type: str, size: tuple[int, int],
     )
 
 
-def generate_text_thumbnail_bytes(target: Path, file_type: str, size: tuple[int, int]) -> bytes:
+def warm_placeholder_thumbnails(size: tuple[int, int]) -> None:
+    """Render every placeholder variant for one size so first requests find them in the memory cache."""
+    for file_type in _THUMBNAIL_LABELS:
+        generate_placeholder_thumbnail_bytes(file_type, size)
+
+
+# Video, PDF and text thumbnails are not memory-cached here: generate_cached_thumbnail keeps them on disk
+# and its reads are what the memory LRU holds. stats stays in the signatures for callers that pass it.
+def generate_text_thumbnail_bytes(target: Path, file_type: str, size: tuple[int, int], *, stats: os.stat_result | None = None) -> bytes:
+    del stats
     width, height = _normalize_thumbnail_size(size)
-    stats = target.stat()
     normalized_type = file_type if file_type in _TEXT_THUMBNAIL_TYPES else "text"
-    return _text_thumbnail_cache(
-        str(target),
-        stats.st_mtime_ns,
-        stats.st_size,
-        normalized_type,
-        width,
-        height,
-    )
+    return _render_text_thumbnail(str(target), normalized_type, width, height)
 
 
-def generate_thumbnail_bytes(image_path: Path, size: tuple[int, int]) -> bytes:
+def generate_thumbnail_bytes(image_path: Path, size: tuple[int, int], *, stats: os.stat_result | None = None) -> bytes:
     width, height = _normalize_thumbnail_size(size)
-    image_stats = image_path.stat()
+    image_stats = stats if stats is not None else image_path.stat()
     return _image_thumbnail_cache(
         str(image_path),
         image_stats.st_mtime_ns,
@@ -490,103 +961,297 @@ def generate_thumbnail_bytes(image_path: Path, size: tuple[int, int]) -> bytes:
     )
 
 
-def generate_video_thumbnail_bytes(video_path: Path, size: tuple[int, int]) -> bytes:
+def generate_video_thumbnail_bytes(video_path: Path, size: tuple[int, int], *, stats: os.stat_result | None = None) -> bytes:
+    del stats
     width, height = _normalize_thumbnail_size(size)
-    video_stats = video_path.stat()
-    return _video_thumbnail_cache(
-        str(video_path),
-        video_stats.st_mtime_ns,
-        video_stats.st_size,
-        width,
-        height,
-    )
+    return _video_thumbnail(str(video_path), width, height)
 
 
-def generate_pdf_thumbnail_bytes(pdf_path: Path, size: tuple[int, int]) -> bytes:
+def generate_pdf_thumbnail_bytes(pdf_path: Path, size: tuple[int, int], *, stats: os.stat_result | None = None) -> bytes:
+    del stats
     width, height = _normalize_thumbnail_size(size)
-    pdf_stats = pdf_path.stat()
-    return _pdf_thumbnail_cache(
-        str(pdf_path),
-        pdf_stats.st_mtime_ns,
-        width,
-        height,
-    )
-
-
-def generate_file_thumbnail_bytes(target: Path, file_type: str, size: tuple[int, int]) -> bytes:
+    return _render_pdf_thumbnail(str(pdf_path), width, height)
+
+
+def generate_file_thumbnail_bytes(
+    target: Path,
+    file_type: str,
+    size: tuple[int, int],
+    *,
+    stats: os.stat_result | None = None,
+) -> bytes:
+    return _render_file_thumbnail(target, file_type, size, stats=stats)[0]
+
+
+def _render_file_thumbnail(
+    target: Path,
+    file_type: str,
+    size: tuple[int, int],
+    *,
+    stats: os.stat_result | None = None,
+) -> tuple[bytes, bool]:
+    """Render a thumbnail as (payload, fallback); fallback means the real render failed and a placeholder stands in."""
     if file_type == "video" and not _video_thumbnails_enabled():
-        return generate_placeholder_thumbnail_bytes("video", size)
+        return generate_placeholder_thumbnail_bytes("video", size), False
     if file_type == "image":
-        return generate_thumbnail_bytes(target, size)
+        return generate_thumbnail_bytes(target, size, stats=stats), False
     if file_type == "video":
         try:
-            return generate_video_thumbnail_bytes(target, size)
+            return generate_video_thumbnail_bytes(target, size, stats=stats), False
         except (FileNotFoundError, PermissionError, OSError, UnidentifiedImageError, subprocess.TimeoutExpired):
-            return generate_placeholder_thumbnail_bytes("video", size)
+            return generate_placeholder_thumbnail_bytes("video", size), True
     if file_type == "pdf":
         try:
-            return generate_pdf_thumbnail_bytes(target, size)
+            return generate_pdf_thumbnail_bytes(target, size, stats=stats), False
         except (FileNotFoundError, PermissionError, OSError, UnidentifiedImageError):
-            return generate_placeholder_thumbnail_bytes("pdf", size)
+            return generate_placeholder_thumbnail_bytes("pdf", size), True
     if file_type == "directory":
-        return generate_placeholder_thumbnail_bytes("directory", size)
+        return generate_placeholder_thumbnail_bytes("directory", size), False
     if file_type in _TEXT_THUMBNAIL_TYPES:
         try:
-            return generate_text_thumbnail_bytes(target, file_type, size)
+            return generate_text_thumbnail_bytes(target, file_type, size, stats=stats), False
         except (FileNotFoundError, PermissionError, OSError, UnicodeError):
-            return generate_placeholder_thumbnail_bytes(file_type, size)
-    return generate_placeholder_thumbnail_bytes(file_type, size)
+            return generate_placeholder_thumbnail_bytes(file_type, size), True
+    return generate_placeholder_thumbnail_bytes(file_type, size), False
+
+
+def _generate_queued_thumbnail(
+    target: Path,
+    file_type: str,
+    size: tuple[int, int],
+    stats: os.stat_result | None,
+    cache_path: Path | None = None,
+) -> tuple[bytes, bool] | None:
+    """Render a video/PDF thumbnail on the bounded worker pool; None means fall back to a placeholder.
+
+    Bursts (a directory of videos opened for the first time) queue up instead of failing fast; only a
+    backlog deeper than STREAM_THUMBNAIL_MAX_QUEUED or a render that outlasts the wait gives up.
+    """
+    global _thumbnail_generation_pending
+    max_queued = _env_int("STREAM_THUMBNAIL_MAX_QUEUED", THUMBNAIL_GENERATION_DEFAULT_MAX_QUEUED, minimum=1, maximum=1024)
+    with _thumbnail_generation_lock:
+        if _thumbnail_generation_pending >= max_queued:
+            return None
+        _thumbnail_generation_pending += 1
+
+    def _finished(_future: Future) -> None:
+        global _thumbnail_generation_pending
+        with _thumbnail_generation_lock:
+            _thumbnail_generation_pending -= 1
+
+    future = _thumbnail_generation_executor.submit(_render_and_store_thumbnail, target, file_type, size, stats, cache_path)
+    future.add_done_callback(_finished)
+    try:
+        # A render that outlives the wait still lands in the disk cache for the next request.
+        return future.result(timeout=THUMBNAIL_GENERATION_WAIT_SECONDS)
+    except FutureTimeoutError:
+        return None
 
 
-def generate_cached_thumbnail_bytes(target: Path, file_type: str, size: tuple[int, int]) -> bytes:
+def generate_cached_thumbnail_bytes(
+    target: Path,
+    file_type: str,
+    size: tuple[int, int],
+    *,
+    stats: os.stat_result | None = None,
+) -> bytes:
+    return generate_cached_thumbnail(target, file_type, size, stats=stats)[0]
+
+
+def generate_cached_thumbnail(
+    target: Path,
+    file_type: str,
+    size: tuple[int, int],
+    *,
+    stats: os.stat_result | None = None,
+) -> tuple[bytes, bool]:
+    """Thumbnail through the disk cache as (payload, fallback).
+
+    A fallback is the placeholder standing in for a render that failed or could not be queued. It is
+    never written to the disk cache, so every cache hit is a real result and the next miss retries.
+    """
     width, height = _normalize_thumbnail_size(size)
     cacheable_types = {"video", "pdf", "word", "excel", "code", "text", "markdown", "html", "directory"}
-    uses_cache = file_type in cacheable_types
 
-    ttl_seconds = _thumbnail_cache_ttl_seconds()
-    max_bytes = _thumbnail_cache_max_bytes()
     cache_path: Path | None = None
-    if uses_cache:
-        cache_path = _thumbnail_cache_path(target, file_type, width, height)
-        cached = _read_cached_thumbnail(cache_path, ttl_seconds)
+    if file_type in cacheable_types:
+        cache_path = _thumbnail_cache_path(target, file_type, width, height, stats=stats)
+        cached = _read_cached_thumbnail(
+            cache_path,
+            _thumbnail_cache_ttl_seconds(),
+            lambda: generate_placeholder_thumbnail_bytes(file_type, (width, height)),
+        )
         if cached is not None:
-            return cached
+            return cached, False
+
+    if file_type in {"video", "pdf"}:
+        rendered = _generate_queued_thumbnail(target, file_type, (width, height), stats, cache_path)
+        if rendered is None:
+            return generate_placeholder_thumbnail_bytes(file_type, (width, height)), True
+        return rendered
+    return _render_and_store_thumbnail(target, file_type, (width, height), stats, cache_path)
+
+
+def _render_and_store_thumbnail(
+    target: Path,
+    file_type: str,
+    size: tuple[int, int],
+    stats: os.stat_result | None,
+    cache_path: Path | None,
+) -> tuple[bytes, bool]:
+    payload, fallback = _render_file_thumbnail(target, file_type, size, stats=stats)
+    if cache_path is not None and not fallback:
+        if payload == generate_placeholder_thumbnail_bytes(file_type, size):
+            _link_placeholder_thumbnail(cache_path, payload)
+        else:
+            _write_cached_thumbnail(cache_path, payload)
+        _prune_thumbnail_cache(_thumbnail_cache_ttl_seconds(), _thumbnail_cache_max_bytes())
+    return payload, fallback
+
+
+# H.264 encoders for live transcoding, in the order STREAM_VIDEO_ENCODER=auto tries them. Each maps to
+# (args before -i, suffix for the scale filter, encoder args standing in for libx264 veryfast/crf 23).
+# Decoding and scaling stay on the CPU; the encoders take system-memory frames (VAAPI via hwupload).
+_H264_ENCODERS: dict[str, tuple[tuple[str, ...], str, tuple[str, ...]]] = {
+    "h264_nvenc": ((), "", ("-preset", "p4", "-rc", "vbr", "-cq", "23", "-b:v", "0", "-pix_fmt", "yuv420p")),
+    "h264_qsv": ((), "", ("-preset", "veryfast", "-global_quality", "23", "-pix_fmt", "nv12")),
+    "h264_videotoolbox": ((), "", ("-b:v", "6M", "-allow_sw", "1", "-pix_fmt", "yuv420p")),
+    "h264_vaapi": (("-vaapi_device", "/dev/dri/renderD128"), ",format=nv12,hwupload", ("-qp", "23")),
+    "libx264": ((), "", ("-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p")),
+}
 
-    heavy_type = file_type in {"video", "pdf"}
-    acquired = True
-    if heavy_type:
-        timeout = _env_int("STREAM_THUMBNAIL_ACQUIRE_TIMEOUT_MS", int(THUMBNAIL_GENERATION_ACQUIRE_TIMEOUT_SECONDS * 1000), minimum=20, maximum=2000) / 1000
-        acquired = _thumbnail_generation_sem.acquire(timeout=timeout)
-        if not acquired:
-            return generate_placeholder_thumbnail_bytes(file_type, (width, height))
 
-    try:
-        payload = generate_file_thumbnail_bytes(target, file_type, (width, height))
-    finally:
-        if heavy_type and acquired:
-            _thumbnail_generation_sem.release()
+_h264_encoder_probes: dict[str, Future[str]] = {}
+_h264_encoder_probes_lock = threading.Lock()
 
-    if uses_cache and cache_path is not None:
-        _write_cached_thumbnail(cache_path, payload)
-        _prune_thumbnail_cache(ttl_seconds, max_bytes)
-    return payload
 
+def _h264_encoder_probe(ffmpeg_bin: str) -> Future[str]:
+    """The auto-mode encoder probe for one ffmpeg binary, started on a background thread the first time."""
+    with _h264_encoder_probes_lock:
+        probe = _h264_encoder_probes.get(ffmpeg_bin)
+        if probe is not None:
+            return probe
+        probe = Future()
+        _h264_encoder_probes[ffmpeg_bin] = probe
 
-def iter_transcoded_video_chunks(video_path: Path, *, chunk_size: int = STREAM_CHUNK_BYTES, start_time: float = 0.0):
+    def run() -> None:
+        try:
+            probe.set_result(_h264_encoder_for(ffmpeg_bin, "auto"))
+        except Exception:  # noqa: BLE001
+            probe.set_result("libx264")
+
+    threading.Thread(target=run, name="h264-encoder-probe", daemon=True).start()
+    return probe
+
+
+def warm_h264_encoder() -> None:
+    """Start the STREAM_VIDEO_ENCODER=auto probe off the request path (called at startup)."""
+    ffmpeg_bin = _resolve_ffmpeg_bin()
+    if ffmpeg_bin and os.environ.get("STREAM_VIDEO_ENCODER", "auto").strip().lower() in {"", "auto"}:
+        _h264_encoder_probe(ffmpeg_bin)
+
+
+def _select_h264_encoder() -> str:
     ffmpeg_bin = _resolve_ffmpeg_bin()
+    preference = os.environ.get("STREAM_VIDEO_ENCODER", "auto").strip().lower() or "auto"
     if not ffmpeg_bin:
-        raise FileNotFoundError("ffmpeg is not available on this host")
+        return "libx264"
+    if preference != "auto":
+        return _h264_encoder_for(ffmpeg_bin, preference)
+    # Streams never wait on the probe: until it has finished they transcode with libx264.
+    probe = _h264_encoder_probe(ffmpeg_bin)
+    return probe.result() if probe.done() else "libx264"
+
+
+@lru_cache(maxsize=4)
+def _h264_encoder_for(ffmpeg_bin: str, preference: str) -> str:
+    """Pick the transcode encoder once per ffmpeg binary and setting.
+
+    An encoder listed by `ffmpeg -encoders` may still have no device behind it, so auto mode only takes
+    one that encodes a test frame; anything else (or an unknown setting) falls back to libx264. All the
+    probes together get TRANSCODE_ENCODER_PROBE_TIMEOUT_SECONDS.
+    """
+    if preference != "auto":
+        return preference if preference in _H264_ENCODERS else "libx264"
+    deadline = time.monotonic() + TRANSCODE_ENCODER_PROBE_TIMEOUT_SECONDS
+    try:
+        listing = subprocess.run(
+            [ffmpeg_bin, "-hide_banner", "-encoders"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=False,
+            timeout=TRANSCODE_ENCODER_PROBE_TIMEOUT_SECONDS,
+        ).stdout.decode("utf-8", errors="replace")
+    except (OSError, subprocess.TimeoutExpired):
+        return "libx264"
+    available = set(listing.split())
+    for encoder, (input_args, filter_suffix, output_args) in _H264_ENCODERS.items():
+        if encoder == "libx264" or encoder not in available:
+            continue
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        probe = [
+            ffmpeg_bin,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-nostdin",
+            *input_args,
+            "-f",
+            "lavfi",
+            "-i",
+            "color=black:size=256x144:duration=0.1",
+            "-vf",
+            f"scale=256:144{filter_suffix}",
+            "-frames:v",
+            "1",
+            "-c:v",
+            encoder,
+            *output_args,
+            "-f",
+            "null",
+            "-",
+        ]
+        try:
+            completed = subprocess.run(
+                probe,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=False,
+                timeout=remaining,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        if completed.returncode == 0:
+            return encoder
+    return "libx264"
 
+
+def _enlarge_pipe(fd: int) -> None:
+    # A larger pipe lets ffmpeg keep encoding while a slow client drains the response.
+    set_pipe_size = getattr(fcntl, "F_SETPIPE_SZ", None)
+    if set_pipe_size is None:
+        return
+    try:
+        fcntl.fcntl(fd, set_pipe_size, TRANSCODE_PIPE_BYTES)
+    except OSError:
+        pass
+
+
+def _transcode_command(ffmpeg_bin: str, video_path: Path, start_time: float, encoder: str) -> list[str]:
+    input_args, filter_suffix, encoder_args = _H264_ENCODERS[encoder]
     command = [
         ffmpeg_bin,
         "-hide_banner",
         "-loglevel",
         "error",
         "-nostdin",
+        *input_args,
     ]
     if start_time > 0:
         command.extend(["-ss", str(float(start_time))])
-        
+
     command.extend([
         "-i",
         str(video_path),
@@ -596,15 +1261,10 @@ def iter_transcoded_video_chunks(video_path: Path, *, chunk_size: int = STREAM_C
         "0:a:0?",
         "-sn",
         "-vf",
-        "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+        f"scale=trunc(iw/2)*2:trunc(ih/2)*2{filter_suffix}",
         "-c:v",
-        "libx264",
-        "-preset",
-        "veryfast",
-        "-crf",
-        "23",
-        "-pix_fmt",
-        "yuv420p",
+        encoder,
+        *encoder_args,
         "-c:a",
         "aac",
         "-b:a",
@@ -617,15 +1277,22 @@ def iter_transcoded_video_chunks(video_path: Path, *, chunk_size: int = STREAM_C
         "mp4",
         "pipe:1",
     ])
+    return command
 
+
+def _start_transcode(command: list[str], chunk_size: int) -> tuple[subprocess.Popen, bytes]:
+    # Unbuffered: each read() is a single os.read() straight into the chunk that gets yielded, and with the
+    # enlarged pipe a single read picks up to 256 KiB of what ffmpeg queued while the client was slow.
     process = subprocess.Popen(  # noqa: S603
         command,
         stdout=subprocess.PIPE,
         stderr=subprocess.DEVNULL,
+        bufsize=0,
     )
     if not process.stdout:
         process.kill()
         raise OSError("Failed to create ffmpeg stream")
+    _enlarge_pipe(process.stdout.fileno())
 
     first_chunk = process.stdout.read(chunk_size)
     if not first_chunk:
@@ -636,6 +1303,23 @@ def iter_transcoded_video_chunks(video_path: Path, *, chunk_size: int = STREAM_C
             process.kill()
             process.wait(timeout=2)
         raise OSError("ffmpeg did not produce output")
+    return process, first_chunk
+
+
+def iter_transcoded_video_chunks(video_path: Path, *, chunk_size: int = TRANSCODE_READ_CHUNK_BYTES, start_time: float = 0.0):
+    ffmpeg_bin = _resolve_ffmpeg_bin()
+    if not ffmpeg_bin:
+        raise FileNotFoundError("ffmpeg is not available on this host")
+
+    encoder = _select_h264_encoder()
+    try:
+        process, first_chunk = _start_transcode(_transcode_command(ffmpeg_bin, video_path, start_time, encoder), chunk_size)
+    except OSError:
+        if encoder == "libx264":
+            raise
+        # A hardware encoder that passed the probe can still refuse a given file (session limits, resolution
+        # or profile caps, driver errors); libx264 handles anything ffmpeg can decode.
+        process, first_chunk = _start_transcode(_transcode_command(ffmpeg_bin, video_path, start_time, "libx264"), chunk_size)
 
     def _generator():
         try:
@@ -660,22 +1344,30 @@ def iter_transcoded_video_chunks(video_path: Path, *, chunk_size: int = STREAM_C
     return _generator()
 
 
-def get_video_info(video_path: Path) -> dict[str, Any]:
-    ffmpeg_bin = _resolve_ffmpeg_bin()
-    if not ffmpeg_bin:
+def get_video_info(video_path: Path, *, stats: os.stat_result | None = None) -> dict[str, Any]:
+    ffprobe_bin = _resolve_ffprobe_bin()
+    if not ffprobe_bin:
+        return {"duration": 0}
+    try:
+        if stats is None:
+            stats = video_path.stat()
+        duration = _video_duration_cache(ffprobe_bin, str(video_path), stats.st_mtime_ns, stats.st_size)
+    except Exception:
         return {"duration": 0}
-    ffprobe_bin = ffmpeg_bin.replace("ffmpeg", "ffprobe")
+    return {"duration": duration}
+
+
+@lru_cache(maxsize=512)
+def _video_duration_cache(ffprobe_bin: str, path_key: str, mtime_ns: int, size_bytes: int) -> float:
+    # Failures raise and so are not cached; the next request probes again.
+    del mtime_ns, size_bytes
     command = [
         ffprobe_bin,
         "-v", "error",
         "-show_entries", "format=duration",
         "-of", "default=noprint_wrappers=1:nokey=1",
-        str(video_path)
+        path_key
     ]
-    try:
-        res = subprocess.run(command, capture_output=True, text=True, timeout=5)
-        duration = float(res.stdout.strip())
-        return {"duration": duration}
-    except Exception:
-        return {"duration": 0}
+    res = subprocess.run(command, capture_output=True, text=True, timeout=5)
+    return float(res.stdout.strip())
 
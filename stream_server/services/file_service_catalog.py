@@ -3,6 +3,8 @@ from __future__ import annotations
 import mimetypes
 import math
 import os
+from operator import itemgetter
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import lru_cache
 from pathlib import Path, PurePosixPath, PureWindowsPath
 from typing import Any
@@ -90,32 +92,42 @@ TEXT_EXTENSIONS = {
 }
 LIST_DEFAULT_MAX_ENTRIES = 400
 LIST_MAX_ENTRIES_CAP = 6000
-
+SEARCH_SCAN_PREFETCH = 8
+
+_search_scan_executor = ThreadPoolExecutor(max_workers=SEARCH_SCAN_PREFETCH, thread_name_prefix="search-scandir")
+
+
+_CODE_FILE_NAMES = {"dockerfile", "makefile", ".env", ".gitignore"}
+# Earlier groups win when an extension appears twice, matching the order get_file_type used to test them in.
+_EXTENSION_TYPES: dict[str, str] = {}
+for _file_type, _extensions in (
+    ("video", VIDEO_EXTENSIONS),
+    ("svg", SVG_EXTENSIONS),
+    ("image", IMAGE_EXTENSIONS),
+    ("pdf", PDF_EXTENSIONS),
+    ("word", WORD_EXTENSIONS),
+    ("excel", EXCEL_EXTENSIONS),
+    ("markdown", MARKDOWN_EXTENSIONS),
+    ("html", HTML_EXTENSIONS),
+    ("code", CODE_EXTENSIONS),
+    ("text", TEXT_EXTENSIONS),
+):
+    for _extension in _extensions:
+        _EXTENSION_TYPES.setdefault(_extension, _file_type)
+del _file_type, _extensions, _extension
+
+
+@lru_cache(maxsize=4096)
 def get_file_type(filename: str | Path) -> str:
-    extension = Path(str(filename)).suffix.lower()
-    base_name = Path(str(filename)).name.lower()
-
-    if extension in VIDEO_EXTENSIONS:
-        return "video"
-    if extension in SVG_EXTENSIONS:
-        return "svg"
-    if extension in IMAGE_EXTENSIONS:
-        return "image"
-    if extension in PDF_EXTENSIONS:
-        return "pdf"
-    if extension in WORD_EXTENSIONS:
-        return "word"
-    if extension in EXCEL_EXTENSIONS:
-        return "excel"
-    if extension in MARKDOWN_EXTENSIONS:
-        return "markdown"
-    if extension in HTML_EXTENSIONS:
-        return "html"
-    if extension in CODE_EXTENSIONS or base_name in {"dockerfile", "makefile", ".env", ".gitignore"}:
+    base_name = os.path.basename(os.fspath(filename)).lower()
+    # Same rule as PurePath.suffix: a leading dot (".env") or a trailing one ("name.") is not an extension.
+    dot = base_name.rfind(".")
+    extension = base_name[dot:] if 0 < dot < len(base_name) - 1 else ""
+    file_type = _EXTENSION_TYPES.get(extension)
+    if file_type is not None:
+        return file_type
+    if base_name in _CODE_FILE_NAMES:
         return "code"
-    if extension in TEXT_EXTENSIONS:
-        return "text"
-
     return "other"
 
 
@@ -166,9 +178,40 @@ def to_client_path(path: Path, root_dir: Path) -> str:
     return relative_path.as_posix()
 
 
-def _entry_to_item(root_dir: Path, entry_path: Path, is_directory: bool) -> dict[str, Any]:
+def _to_client_path_fast(path_str: str, root_str: str) -> str:
+    """to_client_path() for a path reached from the resolved root without following symlinks: no resolve()."""
+    return path_str[len(root_str):].lstrip(os.sep).replace(os.sep, "/")
+
+
+def _child_client_path(parent_client_path: str, name: str) -> str:
+    return f"{parent_client_path}/{name}" if parent_client_path else name
+
+
+# Listing rows are cached as plain tuples in this field order; dicts are only built for the page being served.
+_LISTING_FIELDS = ("name", "is_dir", "path", "parent_path", "type", "size", "modified_at", "created_at")
+ListingRow = tuple[str, bool, str, str, str, int, float, float]
+
+
+def _entry_to_item(
+    root_dir: Path,
+    entry: os.DirEntry[str],
+    is_directory: bool,
+    *,
+    parent_client_path: str | None = None,
+) -> dict[str, Any]:
+    return dict(zip(_LISTING_FIELDS, _entry_to_row(root_dir, entry, is_directory, parent_client_path=parent_client_path)))
+
+
+def _entry_to_row(
+    root_dir: Path,
+    entry: os.DirEntry[str],
+    is_directory: bool,
+    *,
+    parent_client_path: str | None = None,
+) -> ListingRow:
     try:
-        stat = entry_path.stat()
+        # DirEntry caches its stat (free on Windows, where scandir already returned it).
+        stat = entry.stat()
         size = stat.st_size
         mtime = stat.st_mtime
         ctime = stat.st_ctime
@@ -177,45 +220,79 @@ def _entry_to_item(root_dir: Path, entry_path: Path, is_directory: bool) -> dict
         mtime = 0
         ctime = 0
 
-    return {
-        "name": entry_path.name,
-        "is_dir": is_directory,
-        "path": to_client_path(entry_path, root_dir),
-        "parent_path": to_client_path(entry_path.parent, root_dir),
-        "type": "directory" if is_directory else get_file_type(entry_path.name),
-        "size": size,
-        "modified_at": mtime,
-        "created_at": ctime,
-    }
+    if parent_client_path is None:
+        entry_path = Path(entry.path)
+        client_path = to_client_path(entry_path, root_dir)
+        parent_client_path = to_client_path(entry_path.parent, root_dir)
+    else:
+        # Caller vouches that entry is a non-symlink child of an already resolved directory.
+        client_path = _child_client_path(parent_client_path, entry.name)
+
+    return (
+        entry.name,
+        is_directory,
+        client_path,
+        parent_client_path,
+        "directory" if is_directory else get_file_type(entry.name),
+        size,
+        mtime,
+        ctime,
+    )
 
 
 def _normalize_list_limit(max_entries: int) -> int:
     return max(1, min(int(max_entries), LIST_MAX_ENTRIES_CAP))
 
 
-def _iter_ranked_entries(root_dir: Path, directory: Path):
+def _iter_ranked_entries(root_dir: Path, directory: Path, current_path: str):
+    # Everything that only depends on the directory is bound once here, so the per-entry work for plain
+    # children is a stat, a string concatenation and a dict lookup; only symlinks go through _entry_to_row
+    # (they need resolving and may point outside the root).
+    child_prefix = f"{current_path}/" if current_path else ""
+    file_type_of = get_file_type
     with os.scandir(directory) as entries:
         for entry in entries:
+            name = entry.name
             try:
                 is_directory = entry.is_dir(follow_symlinks=False)
+                is_symlink = entry.is_symlink()
             except OSError:
                 continue
-            entry_path = Path(entry.path)
-            try:
-                item = _entry_to_item(root_dir, entry_path, is_directory)
-            except ValueError:
-                # Skip symlinks or mount points that resolve outside the configured root.
-                continue
-            sort_key = (0 if is_directory else 1, entry.name.casefold(), entry.name)
-            yield sort_key, item
-
-
-def _compute_directory_entries(root_dir: Path, directory: Path) -> tuple[str, str | None, tuple[dict[str, Any], ...]]:
-    ranked_items = sorted(_iter_ranked_entries(root_dir, directory), key=lambda row: row[0])
+            if is_symlink:
+                try:
+                    row = _entry_to_row(root_dir, entry, is_directory)
+                except ValueError:
+                    # Skip symlinks that resolve outside the configured root.
+                    continue
+            else:
+                try:
+                    stat = entry.stat()
+                    size = stat.st_size
+                    mtime = stat.st_mtime
+                    ctime = stat.st_ctime
+                except OSError:
+                    size = 0
+                    mtime = 0
+                    ctime = 0
+                row = (
+                    name,
+                    is_directory,
+                    child_prefix + name,
+                    current_path,
+                    "directory" if is_directory else file_type_of(name),
+                    size,
+                    mtime,
+                    ctime,
+                )
+            yield (0 if is_directory else 1, name.casefold(), name), row
+
+
+def _compute_directory_entries(root_dir: Path, directory: Path) -> tuple[str, str | None, tuple[ListingRow, ...]]:
     current_path = to_client_path(directory, root_dir)
+    ranked_rows = sorted(_iter_ranked_entries(root_dir, directory, current_path), key=itemgetter(0))
     parent_path = None if directory == root_dir else to_client_path(directory.parent, root_dir)
-    items = tuple(item for _, item in ranked_items)
-    return current_path, parent_path, items
+    rows = tuple(row for _, row in ranked_rows)
+    return current_path, parent_path, rows
 
 
 @lru_cache(maxsize=64)
@@ -223,7 +300,7 @@ def _cached_directory_entries(
     root_dir_str: str,
     directory_str: str,
     directory_mtime_ns: int,
-) -> tuple[str, str | None, tuple[dict[str, Any], ...]]:
+) -> tuple[str, str | None, tuple[ListingRow, ...]]:
     del directory_mtime_ns
     root_dir = Path(root_dir_str)
     directory = Path(directory_str)
@@ -235,17 +312,17 @@ def list_directory(root_dir: Path, directory: Path, *, max_entries: int = LIST_D
     root_resolved = root_dir.resolve()
     directory_resolved = directory.resolve()
     directory_mtime_ns = directory_resolved.stat().st_mtime_ns
-    current_path, parent_path, cached_items = _cached_directory_entries(
+    current_path, parent_path, cached_rows = _cached_directory_entries(
         str(root_resolved),
         str(directory_resolved),
         directory_mtime_ns,
     )
-    total_items = len(cached_items)
+    total_items = len(cached_rows)
     total_pages = max(1, math.ceil(total_items / limit))
     current_page = max(1, min(page, total_pages))
     start_idx = (current_page - 1) * limit
     end_idx = start_idx + limit
-    items = [dict(item) for item in cached_items[start_idx:end_idx]]
+    items = [dict(zip(_LISTING_FIELDS, row)) for row in cached_rows[start_idx:end_idx]]
     return {
         "current_path": current_path,
         "parent_path": parent_path,
@@ -256,6 +333,52 @@ def list_directory(root_dir: Path, directory: Path, *, max_entries: int = LIST_D
     }
 
 
+def _scan_sorted_directory(directory: str) -> tuple[list[os.DirEntry[str]], list[os.DirEntry[str]]] | None:
+    directories: list[os.DirEntry[str]] = []
+    files: list[os.DirEntry[str]] = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    is_directory = entry.is_dir()
+                except OSError:
+                    is_directory = False
+                (directories if is_directory else files).append(entry)
+    except OSError:
+        # Keep search resilient when some directories are inaccessible.
+        return None
+    directories.sort(key=lambda entry: entry.name.casefold())
+    files.sort(key=lambda entry: entry.name.casefold())
+    return directories, files
+
+
+def _walk_sorted_entries(start_directory: Path):
+    """Walk like os.walk(topdown, followlinks=False) with casefold-sorted levels, keeping DirEntry objects.
+
+    The next few directories on the stack are read ahead on a small thread pool, so getdents and
+    d_type stats overlap with matching; results are still yielded in plain depth-first order.
+    """
+    pending = [os.fspath(start_directory)]
+    scans: dict[str, Future] = {}
+    try:
+        while pending:
+            for path in pending[-SEARCH_SCAN_PREFETCH:]:
+                if path not in scans:
+                    scans[path] = _search_scan_executor.submit(_scan_sorted_directory, path)
+            directory = pending.pop()
+            listing = scans.pop(directory).result()
+            if listing is None:
+                continue
+            directories, files = listing
+            yield directory, directories, files
+            # Reversed so the first directory in sorted order is walked next (depth-first, like os.walk).
+            pending.extend(entry.path for entry in reversed(directories) if not entry.is_symlink())
+    finally:
+        # The caller stopped early (enough results): drop read-aheads that have not started.
+        for scan in scans.values():
+            scan.cancel()
+
+
 def search_entries(
     root_dir: Path,
     start_directory: Path,
@@ -277,59 +400,61 @@ def search_entries(
     capped_limit = max(1, min(max_results, 1000))
     items: list[dict[str, Any]] = []
     truncated = False
+    root_str = str(root_dir.resolve())
+    start_directory = start_directory.resolve()
 
-    def match_and_add(path_obj: Path, is_directory: bool) -> bool:
+    def add_item(entry: os.DirEntry[str], is_directory: bool, parent_client_path: str | None = None) -> bool:
         nonlocal truncated
+        items.append(_entry_to_item(root_dir, entry, is_directory, parent_client_path=parent_client_path))
+        if len(items) >= capped_limit:
+            truncated = True
+            return True
+        return False
+
+    def match_and_add(entry: os.DirEntry[str], is_directory: bool) -> bool:
         try:
-            client_path = to_client_path(path_obj, root_dir)
+            client_path = to_client_path(Path(entry.path), root_dir)
         except ValueError:
             return False
 
-        haystacks = (path_obj.name.casefold(), client_path.casefold())
+        haystacks = (entry.name.casefold(), client_path.casefold())
         if not any(normalized_query in hay for hay in haystacks):
             return False
-
-        items.append(_entry_to_item(root_dir, path_obj, is_directory))
-        if len(items) >= capped_limit:
-            truncated = True
-            return True
+        return add_item(entry, is_directory)
+
+    def add_level_matches(directory: str, entries: list[os.DirEntry[str]], is_directory: bool) -> bool:
+        # A non-symlink child's client path is "<directory client path>/<name>", so the query either sits
+        # in the directory part (every entry matches), or in the name plus the few characters before it.
+        # Testing that costs one casefold per candidate instead of resolving every path.
+        directory_client_path = _to_client_path_fast(directory, root_str)
+        prefix = f"{directory_client_path}/".casefold() if directory_client_path else ""
+        whole_level = normalized_query in prefix
+        boundary = prefix[max(0, len(prefix) - len(normalized_query) + 1):] if len(normalized_query) > 1 else ""
+        for entry in entries:
+            if entry.is_symlink():
+                # Symlinks report their resolved target, so match against that instead.
+                if match_and_add(entry, is_directory):
+                    return True
+            elif whole_level or normalized_query in boundary + entry.name.casefold():
+                # Same string concatenation as listings; no resolve() per match.
+                if add_item(entry, is_directory, directory_client_path):
+                    return True
         return False
 
     if recursive:
-        def _on_walk_error(_: OSError) -> None:
-            # Keep search resilient when some directories are inaccessible.
-            return
-
-        for dirpath, dirnames, filenames in os.walk(
-            start_directory,
-            topdown=True,
-            followlinks=False,
-            onerror=_on_walk_error,
-        ):
-            dirnames.sort(key=str.casefold)
-            filenames.sort(key=str.casefold)
-            current_dir = Path(dirpath)
-
-            for directory_name in dirnames:
-                if match_and_add(current_dir / directory_name, True):
-                    break
-            if truncated:
+        for directory, directories, files in _walk_sorted_entries(start_directory):
+            if add_level_matches(directory, directories, True):
                 break
-
-            for filename in filenames:
-                if match_and_add(current_dir / filename, False):
-                    break
-            if truncated:
+            if add_level_matches(directory, files, False):
                 break
     else:
         with os.scandir(start_directory) as entries:
             for entry in entries:
                 try:
-                    path_obj = Path(entry.path)
                     is_directory = entry.is_dir(follow_symlinks=False)
                 except OSError:
                     continue
-                if match_and_add(path_obj, is_directory):
+                if match_and_add(entry, is_directory):
                     break
 
     items.sort(key=lambda item: (not item["is_dir"], item["path"].casefold()))
@@ -342,18 +467,12 @@ def search_entries(
     }
 
 
-def get_adjacent_file(root_dir: Path, current_file: Path, direction: str) -> Path:
-    siblings: list[Path] = []
+def get_adjacent_entry(root_dir: Path, current_file: Path, direction: str) -> os.DirEntry[str]:
+    # current_file comes from resolve_requested_path(), so its directory is already inside the root, and
+    # is_file(follow_symlinks=False) excludes symlinks: no sibling can escape, so none needs resolving.
+    del root_dir
     with os.scandir(current_file.parent) as entries:
-        for entry in entries:
-            if not entry.is_file(follow_symlinks=False):
-                continue
-            entry_path = Path(entry.path)
-            try:
-                to_client_path(entry_path, root_dir)
-            except ValueError:
-                continue
-            siblings.append(entry_path)
+        siblings = [entry for entry in entries if entry.is_file(follow_symlinks=False)]
 
     if not siblings:
         raise FileNotFoundError("No files found in this directory")
@@ -361,7 +480,7 @@ def get_adjacent_file(root_dir: Path, current_file: Path, direction: str) -> Pat
     siblings.sort(key=lambda item: item.name.casefold())
     current_name = current_file.name.casefold()
     current_index = next(
-        (index for index, file_path in enumerate(siblings) if file_path.name.casefold() == current_name),
+        (index for index, entry in enumerate(siblings) if entry.name.casefold() == current_name),
         -1,
     )
     if current_index == -1:
@@ -375,6 +494,10 @@ def get_adjacent_file(root_dir: Path, current_file: Path, direction: str) -> Pat
     raise ValueError("Direction must be 'next' or 'prev'")
 
 
+def get_adjacent_file(root_dir: Path, current_file: Path, direction: str) -> Path:
+    return Path(get_adjacent_entry(root_dir, current_file, direction).path)
+
+
 def guess_mimetype(path: Path, file_type: str | None = None) -> str:
     resolved_type = file_type or get_file_type(path.name)
     if resolved_type in {"code", "text", "markdown"}:
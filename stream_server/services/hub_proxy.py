@@ -14,6 +14,7 @@ from flask import Response, abort, current_app, session, stream_with_context
 from shared.networking import discover_coordinators, local_ipv4_addresses, preferred_lan_ipv4
 from shared.runtime import env_int
 
+from stream_server.auth import is_setup_complete
 from stream_server.settings_store import load_settings
 
 HUB_SESSION_BROWSER_ID_KEY = "hub_browser_id"
@@ -30,11 +31,6 @@ _hub_discovery_cache_lock = threading.Lock()
 _hub_discovery_cache: tuple[float, list[dict[str, Any]]] | None = None
 
 
-def _is_setup_complete() -> bool:
-    pin = str(current_app.config.get("PIN", "")).strip()
-    return pin.isdigit() and len(pin) >= 4
-
-
 def _current_web_port() -> int:
     return env_int("WEB_PORT", int(current_app.config.get("PORT", 5000)), minimum=1, maximum=65535)
 
@@ -264,7 +260,7 @@ def _local_hub_payload() -> dict[str, Any]:
         "name": _local_hub_display_name(),
         "web_url": primary_url,
         "is_local": True,
-        "setup_complete": _is_setup_complete(),
+        "setup_complete": is_setup_complete(),
     }
 
 
@@ -406,7 +402,7 @@ def public_hub_meta(url_root: str) -> dict[str, Any]:
         "id": LOCAL_HUB_ID,
         "name": local_hub["name"],
         "web_url": normalized_root or local_hub["web_url"],
-        "setup_complete": _is_setup_complete(),
+        "setup_complete": is_setup_complete(),
     }
 
 
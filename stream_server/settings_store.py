@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import os
 import secrets
@@ -10,6 +11,7 @@ from typing import Any
 APP_DIR_NAME = "StreamLocalFiles"
 SETTINGS_FILE_NAME = "settings.json"
 DEFAULT_PORT = 5000
+_settings_cache: dict[str, tuple[tuple[int, int], dict[str, Any]]] = {}
 
 
 def _settings_dir() -> Path:
@@ -31,42 +33,69 @@ def settings_path() -> Path:
     return _settings_dir() / SETTINGS_FILE_NAME
 
 
-def load_settings() -> dict[str, Any]:
-    path = settings_path()
-    if not path.exists():
-        return {}
+def _read_settings(path: Path) -> dict[str, Any]:
     try:
-        payload = json.loads(path.read_text(encoding="utf-8"))
-    except (OSError, json.JSONDecodeError):
+        payload = json.loads(path.read_bytes())
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError):
         return {}
     if not isinstance(payload, dict):
         return {}
     return payload
 
 
+def load_settings() -> dict[str, Any]:
+    path = settings_path()
+    try:
+        file_stat = path.stat()
+    except OSError:
+        return {}
+    # Re-parse only when the file changed; callers get their own copy to modify and save.
+    cache_key = str(path)
+    signature = (file_stat.st_mtime_ns, file_stat.st_size)
+    cached = _settings_cache.get(cache_key)
+    if cached is None or cached[0] != signature:
+        cached = (signature, _read_settings(path))
+        _settings_cache[cache_key] = cached
+    return dict(cached[1])
+
+
 def save_settings(settings: dict[str, Any]) -> None:
     path = settings_path()
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text(json.dumps(settings, indent=2, sort_keys=True), encoding="utf-8")
+    _settings_cache.pop(str(path), None)
+
+
+def is_valid_pin(pin: str) -> bool:
+    # isascii() keeps Unicode digits such as superscripts out of PINs.
+    return 4 <= len(pin) <= 12 and pin.isascii() and pin.isdigit()
 
 
 def _normalize_pin(value: Any) -> str:
     candidate = str(value or "").strip()
-    if candidate.isdigit() and 4 <= len(candidate) <= 12:
+    if is_valid_pin(candidate):
         return candidate
     return ""
 
 
-def _normalize_root_dir(value: Any) -> Path:
+def hash_pin(pin: str) -> bytes:
+    return hashlib.sha256(str(pin).encode("utf-8")).digest()
+
+
+def validated_root_dir(value: Any) -> Path | None:
     candidate = str(value or "").strip()
-    if candidate:
-        try:
-            resolved = Path(candidate).expanduser().resolve()
-            if resolved.exists() and resolved.is_dir():
-                return resolved
-        except OSError:
-            pass
-    return Path.home().resolve()
+    if not candidate:
+        return None
+    try:
+        resolved = Path(candidate).expanduser().resolve()
+        # is_dir() already implies exists(); one stat is enough.
+        return resolved if resolved.is_dir() else None
+    except OSError:
+        return None
+
+
+def _normalize_root_dir(value: Any) -> Path:
+    return validated_root_dir(value) or Path.home().resolve()
 
 
 def _normalize_port(value: Any) -> int:
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 import importlib
+import io
+import os
+import time
 from pathlib import Path
 
+import pytest
 from flask import Flask
 
 from stream_server.services import file_service_catalog
@@ -135,3 +139,1042 @@ def test_agent_app_enables_cors_middleware(monkeypatch) -> None:
     app = module.create_app()
     middleware_names = {middleware.cls.__name__ for middleware in app.user_middleware}
     assert "CORSMiddleware" in middleware_names
+
+
+def test_token_round_trip_without_orjson(monkeypatch) -> None:
+    from shared import security
+
+    token = security.issue_token("secret", {"sub": "p-1", "scope": "read"})
+    monkeypatch.setattr(security, "orjson", None)
+    claims = security.decode_token("secret", token)
+    assert claims["sub"] == "p-1"
+    assert security.decode_token("secret", security.issue_token("secret", {"sub": "p-2"}))["sub"] == "p-2"
+
+
+def test_configured_root_dir_follows_config_updates(tmp_path: Path) -> None:
+    from stream_server import auth
+
+    other = tmp_path / "other"
+    other.mkdir()
+    app = Flask(__name__)
+    app.config["ROOT_DIR"] = str(tmp_path / "." / "other" / "..")
+    with app.app_context():
+        assert auth.configured_root_dir() == tmp_path.resolve()
+        assert auth.configured_root_dir() is auth.configured_root_dir()
+        app.config["ROOT_DIR"] = other
+        assert auth.configured_root_dir() == other.resolve()
+
+
+def test_is_valid_pin_rejects_non_ascii_digits() -> None:
+    from stream_server.settings_store import is_valid_pin
+
+    assert is_valid_pin("0420")
+    assert is_valid_pin("123456789012")
+    assert not is_valid_pin("123")
+    assert not is_valid_pin("1234567890123")
+    assert not is_valid_pin("12\u00b234")
+
+
+def test_login_checks_pin_against_stored_digest() -> None:
+    from stream_server import auth
+    from stream_server.settings_store import hash_pin
+
+    app = Flask(__name__)
+    app.config["PIN"] = "2468"
+    app.config["PIN_HASH"] = hash_pin("2468")
+    with app.app_context():
+        assert auth.pin_matches("2468")
+        assert not auth.pin_matches("1357")
+        assert not auth.pin_matches("")
+
+
+def test_decode_token_rejects_truncated_signature() -> None:
+    from shared import security
+
+    body, signature = security.issue_token("secret", {"sub": "p-1"}).split(".", 1)
+    with pytest.raises(security.TokenError):
+        security.decode_token("secret", f"{body}.{signature[:-4]}")
+
+
+def test_transfer_item_sha256_must_be_hex() -> None:
+    from pydantic import ValidationError
+
+    from shared.schemas import TransferItemInput
+
+    assert TransferItemInput(filename="a.txt", size=1, sha256="A" * 64).sha256 == "A" * 64
+    with pytest.raises(ValidationError):
+        TransferItemInput(filename="a.txt", size=1, sha256="z" * 64)
+
+
+def test_orjson_provider_matches_default_provider_output() -> None:
+    from datetime import datetime, timezone
+
+    from flask.json.provider import DefaultJSONProvider
+
+    from stream_server.json_provider import OrjsonProvider
+
+    app = Flask(__name__)
+    payload = {"b": [1, 2.5, None], "a": "é", "when": datetime(2024, 1, 2, tzinfo=timezone.utc), "big": 2**70}
+    fast = OrjsonProvider(app)
+    default = DefaultJSONProvider(app)
+    assert fast.loads(fast.dumps(payload)) == default.loads(default.dumps(payload))
+    with app.app_context():
+        response = fast.response({"items": [{"name": "x"}]})
+    assert response.mimetype == "application/json"
+    assert fast.loads(response.get_data()) == {"items": [{"name": "x"}]}
+
+
+def test_list_streams_ndjson_when_requested(tmp_path: Path, monkeypatch) -> None:
+    from stream_server import create_app
+
+    monkeypatch.setenv("STREAM_SETTINGS_DIR", str(tmp_path / "settings"))
+    root = tmp_path / "root"
+    (root / "sub").mkdir(parents=True)
+    (root / "a.txt").write_text("a", encoding="utf-8")
+    app = create_app()
+    app.config.update(ROOT_DIR=str(root), SETUP_COMPLETE=True, TESTING=True)
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session["authenticated"] = True
+
+    response = client.get("/list?stream=1")
+    assert response.mimetype == "application/x-ndjson"
+    header, *items = [app.json.loads(line) for line in response.get_data().splitlines()]
+    assert "items" not in header
+    assert header["page"] == 1
+    assert items == client.get("/list").json["items"]
+
+
+def test_api_prefix_pattern_matches_whole_segments() -> None:
+    from stream_server import routes
+
+    assert routes._API_PREFIX_RE.match("/list")
+    assert routes._API_PREFIX_RE.match("/api/hubs/abc/unlock")
+    assert routes._API_PREFIX_RE.match("/stream_transcode")
+    assert not routes._API_PREFIX_RE.match("/listing")
+    assert not routes._API_PREFIX_RE.match("/static/list")
+
+
+def test_stream_range_hands_positioned_file_to_server_file_wrapper(tmp_path: Path, monkeypatch) -> None:
+    from stream_server import create_app
+
+    class RecordingFileWrapper:
+        positions: list[int] = []
+
+        def __init__(self, handle, block_size: int) -> None:
+            self.handle = handle
+            RecordingFileWrapper.positions.append(handle.tell())
+
+        def __iter__(self):
+            return iter(())
+
+        def close(self) -> None:
+            self.handle.close()
+
+    monkeypatch.setenv("STREAM_SETTINGS_DIR", str(tmp_path / "settings"))
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "clip.txt").write_bytes(b"0123456789")
+    app = create_app()
+    app.config.update(ROOT_DIR=str(root), SETUP_COMPLETE=True, TESTING=True)
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session["authenticated"] = True
+
+    response = client.get(
+        "/stream?path=clip.txt",
+        headers={"Range": "bytes=4-7"},
+        environ_base={"wsgi.file_wrapper": RecordingFileWrapper},
+    )
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == "bytes 4-7/10"
+    assert response.headers["Content-Length"] == "4"
+    assert RecordingFileWrapper.positions[-1] == 4
+
+    plain = client.get("/stream?path=clip.txt", headers={"Range": "bytes=4-7"})
+    assert plain.get_data() == b"4567"
+
+
+def test_thumbnail_revalidation_skips_rendering(tmp_path: Path, monkeypatch) -> None:
+    from stream_server import create_app, routes
+
+    monkeypatch.setenv("STREAM_SETTINGS_DIR", str(tmp_path / "settings"))
+    monkeypatch.setenv("STREAM_THUMBNAIL_CACHE_DIR", str(tmp_path / "thumb-cache"))
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "notes.txt").write_text("hello", encoding="utf-8")
+    app = create_app()
+    app.config.update(ROOT_DIR=str(root), SETUP_COMPLETE=True, TESTING=True)
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session["authenticated"] = True
+
+    first = client.get("/thumbnail?path=notes.txt")
+    assert first.status_code == 200
+    assert first.mimetype == "image/jpeg"
+
+    def fail_render(*_args, **_kwargs):
+        raise AssertionError("thumbnail should not be rendered for a matching ETag")
+
+    monkeypatch.setattr(routes, "generate_cached_thumbnail", fail_render)
+    revalidated = client.get("/thumbnail?path=notes.txt", headers={"If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == first.headers["ETag"]
+
+
+def test_thumbnail_size_is_kept_per_app(tmp_path: Path, monkeypatch) -> None:
+    import stream_server
+    from stream_server.config import load_app_config
+
+    monkeypatch.setenv("STREAM_SETTINGS_DIR", str(tmp_path / "settings"))
+    monkeypatch.setenv("STREAM_THUMBNAIL_CACHE_DIR", str(tmp_path / "thumb-cache"))
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "notes.txt").write_text("hello", encoding="utf-8")
+    monkeypatch.setattr(stream_server, "load_app_config", lambda: {**load_app_config(), "THUMBNAIL_SIZE": (96, 96)})
+    small_app = stream_server.create_app()
+    monkeypatch.setattr(stream_server, "load_app_config", load_app_config)
+    default_app = stream_server.create_app()
+
+    etags = []
+    for app in (small_app, default_app):
+        app.config.update(ROOT_DIR=str(root), SETUP_COMPLETE=True, TESTING=True)
+        client = app.test_client()
+        with client.session_transaction() as flask_session:
+            flask_session["authenticated"] = True
+        response = client.get("/thumbnail?path=notes.txt")
+        assert response.status_code == 200
+        etags.append(response.headers["ETag"])
+
+    assert etags[0].endswith('-96x96"')
+    assert etags[1].endswith('-220x220"')
+
+
+def test_fallback_thumbnail_is_not_given_a_validator(tmp_path: Path, monkeypatch) -> None:
+    from stream_server import create_app
+
+    monkeypatch.setenv("STREAM_SETTINGS_DIR", str(tmp_path / "settings"))
+    monkeypatch.setenv("STREAM_THUMBNAIL_CACHE_DIR", str(tmp_path / "thumb-cache"))
+    monkeypatch.setattr("stream_server.services.file_service.fitz", None)
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "doc.pdf").write_bytes(b"%PDF-1.7\n%fake\n")
+    (root / "report.docx").write_bytes(b"docx")
+    (root / "empty.txt").write_bytes(b"")
+    app = create_app()
+    app.config.update(ROOT_DIR=str(root), SETUP_COMPLETE=True, TESTING=True)
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session["authenticated"] = True
+
+    fallback = client.get("/thumbnail?path=doc.pdf")
+    assert fallback.status_code == 200
+    assert "ETag" not in fallback.headers
+    assert fallback.cache_control.no_store
+    assert client.get("/thumbnail?path=doc.pdf").cache_control.no_store  # not served back from the disk cache
+
+    # A placeholder that is the real result keeps its validator, whether the type only ever has one
+    # or the file just has nothing to draw.
+    for name in ("report.docx", "empty.txt"):
+        response = client.get(f"/thumbnail?path={name}")
+        assert response.headers.get("ETag")
+        assert response.cache_control.max_age
+
+
+def test_jpeg_thumbnail_keeps_exif_orientation_after_draft_decode(tmp_path: Path) -> None:
+    from PIL import Image
+
+    from stream_server.services.file_service import generate_thumbnail_bytes
+
+    source = tmp_path / "rotated.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW
+    Image.new("RGB", (1600, 800), (200, 40, 40)).save(source, exif=exif)
+
+    payload = generate_thumbnail_bytes(source, (220, 220))
+    with Image.open(io.BytesIO(payload)) as thumbnail:
+        assert thumbnail.size == (110, 220)
+
+
+def test_load_settings_reparses_only_after_changes(tmp_path: Path, monkeypatch) -> None:
+    from stream_server import settings_store
+
+    monkeypatch.setenv("STREAM_SETTINGS_DIR", str(tmp_path))
+    assert settings_store.load_settings() == {}
+
+    settings_store.save_settings({"port": 5001})
+    first = settings_store.load_settings()
+    first["port"] = 9999
+    assert settings_store.load_settings() == {"port": 5001}
+
+    reads: list[Path] = []
+    real_read = settings_store._read_settings
+    monkeypatch.setattr(settings_store, "_read_settings", lambda path: reads.append(path) or real_read(path))
+    settings_store.load_settings()
+    assert reads == []
+
+    settings_store.save_settings({"port": 5002})
+    assert settings_store.load_settings() == {"port": 5002}
+    assert len(reads) == 1
+
+
+def test_adjacent_entry_skips_symlinks_outside_root(tmp_path: Path) -> None:
+    from stream_server.services.file_service import get_adjacent_entry
+
+    root = tmp_path / "root"
+    root.mkdir()
+    outside = tmp_path / "outside.txt"
+    outside.write_text("x", encoding="utf-8")
+    for name in ("a.txt", "c.txt"):
+        (root / name).write_text(name, encoding="utf-8")
+    (root / "b-link.txt").symlink_to(outside)
+
+    current = (root / "a.txt").resolve()
+    assert get_adjacent_entry(root, current, "next").name == "c.txt"
+    assert get_adjacent_entry(root, current, "prev").name == "c.txt"
+
+
+def test_listing_builds_child_paths_and_resolves_only_symlinks(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    (root / "docs" / "deep").mkdir(parents=True)
+    (root / "docs" / "deep" / "target.txt").write_text("t", encoding="utf-8")
+    (root / "docs" / "plain.txt").write_text("p", encoding="utf-8")
+    (root / "docs" / "inside.txt").symlink_to(root / "docs" / "deep" / "target.txt")
+    (tmp_path / "outside.txt").write_text("o", encoding="utf-8")
+    (root / "docs" / "outside.txt").symlink_to(tmp_path / "outside.txt")
+
+    payload = file_service_catalog.list_directory(root, root / "docs")
+    paths = {item["name"]: (item["path"], item["parent_path"]) for item in payload["items"]}
+
+    assert paths == {
+        "deep": ("docs/deep", "docs"),
+        "inside.txt": ("docs/deep/target.txt", "docs"),
+        "plain.txt": ("docs/plain.txt", "docs"),
+    }
+
+
+def test_search_matches_across_directory_boundary(tmp_path: Path) -> None:
+    root = tmp_path.resolve()
+    (root / "Photos" / "2024").mkdir(parents=True)
+    (root / "Photos" / "2024" / "beach.jpg").write_bytes(b"")
+    (root / "notes.txt").write_text("n", encoding="utf-8")
+
+    spanning = file_service_catalog.search_entries(root, root, "2024/bea")
+    assert [item["path"] for item in spanning["items"]] == ["Photos/2024/beach.jpg"]
+
+    whole_directory = file_service_catalog.search_entries(root, root, "photos/")
+    assert [item["path"] for item in whole_directory["items"]] == ["Photos/2024", "Photos/2024/beach.jpg"]
+
+
+def test_simple_byte_range_only_accepts_plain_single_ranges() -> None:
+    from stream_server import routes
+
+    app = Flask(__name__)
+    cases = {
+        "bytes=4-7": (4, 8),
+        "bytes=4-": (4, 10),
+        "bytes=-3": (7, 10),
+        "bytes=8-99": (8, 10),
+        "bytes=7-4": None,
+        "bytes=10-": None,
+        "bytes=0-1,4-5": None,
+        "items=0-1": None,
+    }
+    for header, expected in cases.items():
+        with app.test_request_context(headers={"Range": header}):
+            assert routes._simple_byte_range(10) == expected, header
+    with app.test_request_context(headers={"Range": "bytes=0-1", "If-Range": '"abc"'}):
+        assert routes._simple_byte_range(10) is None
+
+
+def test_concurrent_folder_picks_share_one_dialog(monkeypatch) -> None:
+    import threading
+
+    from stream_server import routes
+
+    release = threading.Event()
+    opened: list[int] = []
+
+    def fake_ask_directory() -> str:
+        opened.append(1)
+        release.wait(5)
+        return "/picked"
+
+    monkeypatch.setattr(routes, "_ask_directory", fake_ask_directory)
+    monkeypatch.setattr(routes, "_folder_dialog_future", None)
+
+    first = routes._folder_dialog()
+    second = routes._folder_dialog()
+    release.set()
+
+    assert first is second
+    assert first.result(timeout=5) == "/picked"
+    assert opened == [1]
+    assert routes._folder_dialog() is not first
+
+
+def test_thumbnail_cache_index_evicts_expired_then_least_recently_used(tmp_path: Path) -> None:
+    from stream_server.services import file_service
+
+    index = file_service._ThumbnailCacheIndex()
+    assert index.take_prune_victims(tmp_path, 1000.0, 600, 100) == []
+
+    old, cold, warm = (tmp_path / f"{name}.jpg" for name in ("old", "cold", "warm"))
+    index.record_write(old, 40, 100.0)
+    index.record_write(cold, 40, 900.0)
+    index.record_write(warm, 40, 950.0)
+    index.record_access(cold, 990.0)
+    index.record_access(warm, 980.0)
+
+    assert index.take_prune_victims(tmp_path, 1000.0, 600, 100) == [str(old)]
+    assert index.take_prune_victims(tmp_path, 1000.0, 600, 50) == [str(warm)]
+
+
+def test_thumbnail_cache_index_seeds_from_nested_jpegs_only(tmp_path: Path) -> None:
+    from stream_server.services import file_service
+
+    bucket = tmp_path / "ab"
+    bucket.mkdir()
+    (bucket / "abcd.jpg").write_bytes(b"x" * 10)
+    (bucket / "abcd.jpg.tmp").write_bytes(b"x" * 10)
+    index = file_service._ThumbnailCacheIndex()
+
+    assert index.take_prune_victims(tmp_path, 4_000_000_000.0, 600, 100) == [str(bucket / "abcd.jpg")]
+
+
+def test_cached_thumbnail_reuses_caller_stat(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("STREAM_THUMBNAIL_CACHE_DIR", str(tmp_path / "cache"))
+    target = tmp_path / "notes.txt"
+    target.write_text("hello", encoding="utf-8")
+    target_stat = target.stat()
+
+    stat_calls: list[Path] = []
+    original_stat = Path.stat
+
+    def counting_stat(self: Path, *args, **kwargs):
+        stat_calls.append(self)
+        return original_stat(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "stat", counting_stat)
+    payload = generate_cached_thumbnail_bytes(target, "text", (96, 96), stats=target_stat)
+
+    assert payload.startswith(b"\xff\xd8")
+    assert target not in stat_calls
+
+
+def test_video_thumbnail_batcher_coalesces_concurrent_misses(monkeypatch: pytest.MonkeyPatch) -> None:
+    import threading
+
+    from stream_server.services import file_service
+
+    batches: list[list[str]] = []
+    release_lone = threading.Event()
+
+    def fake_batch(requests):
+        batches.append([str(path) for path, _size in requests])
+        return [f"thumb:{path.name}".encode() for path, _size in requests]
+
+    def render_one(path_key: str, _width: int, _height: int) -> bytes:
+        release_lone.wait(5)
+        return f"single:{path_key}".encode()
+
+    monkeypatch.setattr(file_service, "generate_video_thumbnails_batch", fake_batch)
+    batcher = file_service._VideoThumbnailBatcher(0.2, 8, render_one)
+    results: dict[str, bytes | None] = {}
+
+    def render(name: str) -> None:
+        results[name] = batcher.render(name, 96, 96)
+
+    # Nothing else is in flight, so the first miss renders alone without waiting out the window;
+    # the misses that arrive while it runs are batched.
+    lone = threading.Thread(target=render, args=("lone.mp4",))
+    lone.start()
+    while batcher._in_flight == 0:
+        time.sleep(0.001)
+    threads = [threading.Thread(target=render, args=(name,)) for name in ("a.mp4", "b.mp4", "c.mp4")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release_lone.set()
+    lone.join()
+
+    assert len(batches) == 1
+    assert sorted(batches[0]) == ["a.mp4", "b.mp4", "c.mp4"]
+    assert results == {
+        "lone.mp4": b"single:lone.mp4",
+        **{name: f"thumb:{name}".encode() for name in ("a.mp4", "b.mp4", "c.mp4")},
+    }
+
+    started = time.monotonic()
+    assert batcher.render("again.mp4", 96, 96) == b"single:again.mp4"
+    assert time.monotonic() - started < 0.2
+    assert batcher._in_flight == 0
+
+
+def test_video_thumbnail_batch_followers_outwait_a_slow_leader(monkeypatch: pytest.MonkeyPatch) -> None:
+    import threading
+
+    from stream_server.services import file_service
+
+    singles: list[str] = []
+
+    def slow_batch(requests):
+        time.sleep(0.3)
+        return [f"thumb:{path.name}".encode() for path, _size in requests]
+
+    def render_one(path_key: str, _width: int, _height: int) -> bytes:
+        singles.append(path_key)
+        return b"single"
+
+    # Each chunk takes longer than one ffmpeg timeout here; followers in the second chunk have to
+    # wait for both, not re-run ffmpeg on their own.
+    monkeypatch.setattr(file_service, "VIDEO_THUMBNAIL_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(file_service, "VIDEO_THUMBNAIL_BATCH_DECODE_SECONDS", 0.2)
+    monkeypatch.setattr(file_service, "generate_video_thumbnails_batch", slow_batch)
+    batcher = file_service._VideoThumbnailBatcher(0.1, 2, render_one)
+    batcher._in_flight = 1  # Another render in flight, so the leader waits for the burst.
+    results: dict[str, bytes] = {}
+
+    def render(name: str) -> None:
+        results[name] = batcher.render(name, 96, 96)
+
+    names = ["a.mp4", "b.mp4", "c.mp4", "d.mp4"]
+    threads = []
+    for name in names:
+        thread = threading.Thread(target=render, args=(name,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert singles == []
+    assert results == {name: f"thumb:{name}".encode() for name in names}
+
+
+def test_ffmpeg_lookup_runs_once_per_override(monkeypatch: pytest.MonkeyPatch) -> None:
+    from stream_server.services import file_service
+
+    lookups: list[str] = []
+
+    def fake_which(name: str) -> str:
+        lookups.append(name)
+        return "/opt/bin/ffmpeg"
+
+    monkeypatch.setattr(file_service.shutil, "which", fake_which)
+    monkeypatch.delenv("STREAM_FFMPEG_BIN", raising=False)
+    file_service._locate_ffmpeg_bin.cache_clear()
+    try:
+        assert file_service._resolve_ffmpeg_bin() == "/opt/bin/ffmpeg"
+        assert file_service._resolve_ffmpeg_bin() == "/opt/bin/ffmpeg"
+        assert file_service._resolve_ffprobe_bin() == "/opt/bin/ffprobe"
+        assert lookups == ["ffmpeg"]
+
+        monkeypatch.setenv("STREAM_FFMPEG_BIN", "/custom/ffmpeg")
+        assert file_service._resolve_ffmpeg_bin() == "/custom/ffmpeg"
+    finally:
+        file_service._locate_ffmpeg_bin.cache_clear()
+
+
+def test_transcode_encoder_auto_takes_first_working_hardware_encoder(monkeypatch: pytest.MonkeyPatch) -> None:
+    import subprocess
+
+    from stream_server.services import file_service
+
+    probed: list[str] = []
+
+    def fake_run(command: list[str], **_kwargs: object) -> subprocess.CompletedProcess[bytes]:
+        if "-encoders" in command:
+            listing = b" V....D libx264   H.264\n V....D h264_nvenc  NVIDIA\n V....D h264_vaapi  VAAPI\n"
+            return subprocess.CompletedProcess(command, 0, stdout=listing)
+        encoder = command[command.index("-c:v") + 1]
+        probed.append(encoder)
+        # nvenc is compiled in but there is no GPU behind it.
+        return subprocess.CompletedProcess(command, 1 if encoder == "h264_nvenc" else 0)
+
+    monkeypatch.setattr(file_service.subprocess, "run", fake_run)
+    file_service._h264_encoder_for.cache_clear()
+    try:
+        assert file_service._h264_encoder_for("/opt/bin/ffmpeg", "auto") == "h264_vaapi"
+        assert file_service._h264_encoder_for("/opt/bin/ffmpeg", "auto") == "h264_vaapi"
+        assert probed == ["h264_nvenc", "h264_vaapi"]
+        assert file_service._h264_encoder_for("/opt/bin/ffmpeg", "libx264") == "libx264"
+        assert file_service._h264_encoder_for("/opt/bin/ffmpeg", "h264_unknown") == "libx264"
+    finally:
+        file_service._h264_encoder_for.cache_clear()
+
+
+def test_transcode_retries_with_libx264_when_hardware_encoder_fails(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from stream_server.services import file_service
+
+    encoders: list[str] = []
+
+    class FakeStdout(io.BytesIO):
+        def fileno(self) -> int:
+            return -1
+
+    class FakePopen:
+        def __init__(self, command: list[str], **_kwargs: object) -> None:
+            encoder = command[command.index("-c:v") + 1]
+            encoders.append(encoder)
+            # Hardware encoders that refuse a file exit without writing anything.
+            self.stdout = FakeStdout(b"mp4-bytes" if encoder == "libx264" else b"")
+
+        def poll(self) -> int:
+            return 0
+
+        def wait(self, timeout: float | None = None) -> int:
+            return 0
+
+        def kill(self) -> None:
+            pass
+
+    monkeypatch.setattr(file_service.subprocess, "Popen", FakePopen)
+    monkeypatch.setattr(file_service, "_resolve_ffmpeg_bin", lambda: "/opt/bin/ffmpeg")
+    monkeypatch.setattr(file_service, "_select_h264_encoder", lambda: "h264_nvenc")
+    monkeypatch.setattr(file_service, "_enlarge_pipe", lambda _fd: None)
+
+    chunks = list(file_service.iter_transcoded_video_chunks(tmp_path / "clip.mkv", chunk_size=64))
+    assert chunks == [b"mp4-bytes"]
+    assert encoders == ["h264_nvenc", "libx264"]
+
+
+def test_transcode_uses_libx264_until_encoder_probe_finishes(monkeypatch: pytest.MonkeyPatch) -> None:
+    import threading
+
+    from stream_server.services import file_service
+
+    release = threading.Event()
+
+    def slow_probe(_ffmpeg_bin: str, _preference: str) -> str:
+        release.wait(5)
+        return "h264_qsv"
+
+    monkeypatch.setattr(file_service, "_h264_encoder_for", slow_probe)
+    monkeypatch.setattr(file_service, "_h264_encoder_probes", {})
+    monkeypatch.setattr(file_service, "_resolve_ffmpeg_bin", lambda: "/opt/bin/ffmpeg")
+    monkeypatch.delenv("STREAM_VIDEO_ENCODER", raising=False)
+
+    assert file_service._select_h264_encoder() == "libx264"
+    release.set()
+    assert file_service._h264_encoder_probes["/opt/bin/ffmpeg"].result(timeout=5) == "h264_qsv"
+    assert file_service._select_h264_encoder() == "h264_qsv"
+
+
+def test_text_thumbnails_share_a_backdrop_without_mutating_it(tmp_path: Path) -> None:
+    from stream_server.services import file_service
+
+    first = tmp_path / "a.py"
+    second = tmp_path / "b.py"
+    first.write_text("print('a')\n", encoding="utf-8")
+    second.write_text("print('b')\n", encoding="utf-8")
+    file_service._text_thumbnail_backdrop.cache_clear()
+
+    backdrop, _header_h = file_service._text_thumbnail_backdrop("code", 160, 120)
+    before = backdrop.tobytes()
+    assert file_service.generate_text_thumbnail_bytes(first, "code", (160, 120)) != file_service.generate_text_thumbnail_bytes(
+        second, "code", (160, 120)
+    )
+
+    assert file_service._text_thumbnail_backdrop.cache_info().misses == 1
+    assert backdrop.tobytes() == before
+
+
+def test_text_thumbnail_snippet_drops_control_bytes(tmp_path: Path) -> None:
+    from stream_server.services import file_service
+
+    target = tmp_path / "notes.txt"
+    target.write_bytes(b"caf\xc3\xa9\x00\x07 ok\r\n\x1b[0mtab\there\n")
+
+    assert file_service._read_text_thumbnail_snippet(target) == "café ok\n[0mtab\there"
+
+
+def test_text_thumbnail_snippet_stops_reading_after_enough_lines(tmp_path: Path) -> None:
+    from stream_server.services import file_service
+
+    target = tmp_path / "long.py"
+    target.write_bytes(b"".join(f"line {index}\n".encode() for index in range(5000)))
+
+    snippet = file_service._read_text_thumbnail_snippet(target)
+
+    assert snippet.splitlines() == [f"line {index}" for index in range(file_service.TEXT_THUMBNAIL_MAX_LINES)]
+
+
+def test_thumbnail_memory_cache_evicts_by_total_bytes(monkeypatch: pytest.MonkeyPatch) -> None:
+    from stream_server.services import file_service
+
+    monkeypatch.setenv("STREAM_THUMBNAIL_MEM_MAX_MB", "4")
+    cache = file_service._ThumbnailMemoryCache()
+    chunk = b"x" * (1536 * 1024)
+    renders: list[str] = []
+
+    def render(name: str) -> bytes:
+        renders.append(name)
+        return chunk
+
+    for name in ("a", "b", "a", "c"):
+        cache.get_or_compute((name,), lambda name=name: render(name))
+    cache.get_or_compute(("a",), lambda: render("a"))
+    cache.get_or_compute(("b",), lambda: render("b"))
+
+    assert renders == ["a", "b", "c", "b"]
+
+
+def test_thumbnail_cache_path_tracks_file_identity_not_just_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from stream_server.services import file_service
+
+    monkeypatch.setenv("STREAM_THUMBNAIL_CACHE_DIR", str(tmp_path / "cache"))
+    target = tmp_path / "notes.txt"
+    target.write_text("first", encoding="utf-8")
+    first_path = file_service._thumbnail_cache_path(target, "text", 96, 96)
+
+    replacement = tmp_path / "replacement.txt"
+    replacement.write_text("other", encoding="utf-8")
+    original_stat = target.stat()
+    os.utime(replacement, ns=(original_stat.st_atime_ns, original_stat.st_mtime_ns))
+    replacement.replace(target)
+
+    assert file_service._thumbnail_cache_path(target, "text", 96, 96) != first_path
+
+
+def test_video_info_probes_each_file_version_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    import subprocess
+
+    from stream_server.services import file_service
+
+    target = tmp_path / "clip.mp4"
+    target.write_bytes(b"not really a video")
+    probes: list[list[str]] = []
+
+    def fake_run(command, **kwargs):
+        probes.append(command)
+        return subprocess.CompletedProcess(command, 0, stdout="12.5\n", stderr="")
+
+    monkeypatch.setattr(file_service, "_resolve_ffprobe_bin", lambda: "ffprobe")
+    monkeypatch.setattr(file_service.subprocess, "run", fake_run)
+    file_service._video_duration_cache.cache_clear()
+    try:
+        assert file_service.get_video_info(target) == {"duration": 12.5}
+        assert file_service.get_video_info(target) == {"duration": 12.5}
+        assert len(probes) == 1
+
+        target.write_bytes(b"a different, longer payload")
+        assert file_service.get_video_info(target) == {"duration": 12.5}
+        assert len(probes) == 2
+    finally:
+        file_service._video_duration_cache.cache_clear()
+
+
+def test_heavy_thumbnails_queue_until_backlog_limit(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from stream_server.services import file_service
+
+    monkeypatch.setenv("STREAM_THUMBNAIL_MAX_QUEUED", "2")
+    rendered: list[str] = []
+
+    def fake_render(target, file_type, size, *, stats=None):
+        rendered.append(target.name)
+        return b"rendered", False
+
+    monkeypatch.setattr(file_service, "_render_file_thumbnail", fake_render)
+    target = tmp_path / "doc.pdf"
+
+    assert file_service._generate_queued_thumbnail(target, "pdf", (96, 96), None) == (b"rendered", False)
+    deadline = time.monotonic() + 5
+    while file_service._thumbnail_generation_pending and time.monotonic() < deadline:
+        time.sleep(0.01)  # the done-callback may still be finishing on the worker thread
+
+    monkeypatch.setattr(file_service, "_thumbnail_generation_pending", 2)
+    assert file_service._generate_queued_thumbnail(target, "pdf", (96, 96), None) is None
+    assert rendered == ["doc.pdf"]
+
+
+def test_cached_thumbnail_write_leaves_no_temp_files(tmp_path: Path) -> None:
+    from stream_server.services import file_service
+
+    bucket = tmp_path / "ab"
+    bucket.mkdir()
+    cache_path = bucket / "abcdef.jpg"
+
+    file_service._write_cached_thumbnail(cache_path, b"jpeg-bytes")
+    file_service._write_cached_thumbnail(cache_path, b"jpeg-bytes")
+
+    assert cache_path.read_bytes() == b"jpeg-bytes"
+    assert sorted(path.name for path in bucket.iterdir()) == ["abcdef.jpg"]
+
+
+def test_failed_cache_publish_does_not_leak_fds(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from stream_server.services import file_service
+
+    bucket = tmp_path / "ab"
+    bucket.mkdir()
+    fd_dir = Path("/proc/self/fd")
+    if not fd_dir.is_dir():
+        pytest.skip("needs /proc/self/fd")
+
+    def failing_link(*_args, **_kwargs) -> None:
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(file_service.os, "link", failing_link)
+    open_before = len(os.listdir(fd_dir))
+    for index in range(50):
+        file_service._write_cached_thumbnail(bucket / f"entry{index}.jpg", b"jpeg-bytes")
+    monkeypatch.undo()
+
+    assert len(os.listdir(fd_dir)) <= open_before
+    # The .tmp + rename fallback still published every entry.
+    assert (bucket / "entry49.jpg").read_bytes() == b"jpeg-bytes"
+
+
+def test_small_upright_jpeg_thumbnail_is_served_as_is(tmp_path: Path) -> None:
+    from PIL import Image
+
+    from stream_server.services import file_service
+
+    small = tmp_path / "small.jpg"
+    Image.new("RGB", (80, 60), color=(10, 120, 200)).save(small, format="JPEG", quality=90)
+    rotated = tmp_path / "rotated.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    Image.new("RGB", (80, 60), color=(10, 120, 200)).save(rotated, format="JPEG", exif=exif)
+
+    assert file_service._render_image_thumbnail(str(small), 128, 128) == small.read_bytes()
+    assert file_service._render_image_thumbnail(str(small), 64, 64) != small.read_bytes()
+    with Image.open(io.BytesIO(file_service._render_image_thumbnail(str(rotated), 128, 128))) as thumb:
+        assert thumb.size == (60, 80)
+
+
+def test_warm_placeholder_thumbnails_fills_memory_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    from stream_server.services import file_service
+
+    cache = file_service._ThumbnailMemoryCache()
+    monkeypatch.setattr(file_service, "_thumbnail_memory_cache", cache)
+    file_service.warm_placeholder_thumbnails((150, 150))
+
+    renders: list[tuple] = []
+    monkeypatch.setattr(file_service.Image, "new", lambda *args, **kwargs: renders.append(args))
+    for file_type in ("video", "pdf", "directory", "other"):
+        assert file_service.generate_placeholder_thumbnail_bytes(file_type, (150, 150)).startswith(b"\xff\xd8")
+    assert renders == []
+
+
+def test_cached_thumbnail_round_trip_creates_bucket_on_write(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from stream_server.services import file_service
+
+    cache_root = tmp_path / "cache"
+    monkeypatch.setenv("STREAM_THUMBNAIL_CACHE_DIR", str(cache_root))
+    target = tmp_path / "notes.txt"
+    target.write_text("hello", encoding="utf-8")
+    cache_path = file_service._thumbnail_cache_path(target, "text", 96, 96)
+
+    assert not cache_root.exists()
+    assert file_service._read_cached_thumbnail(cache_path, 600) is None
+    file_service._write_cached_thumbnail(cache_path, b"jpeg-bytes")
+    first = file_service._read_cached_thumbnail(cache_path, 600)
+    assert first == b"jpeg-bytes"
+    assert file_service._read_cached_thumbnail(cache_path, 600) is first
+
+    os.utime(cache_path, (1, 1))
+    assert file_service._read_cached_thumbnail(cache_path, 600) is None
+    assert not cache_path.exists()
+
+
+def test_placeholder_thumbnails_share_one_inode_on_disk(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from stream_server.services import file_service
+
+    cache_root = tmp_path / "cache"
+    monkeypatch.setenv("STREAM_THUMBNAIL_CACHE_DIR", str(cache_root))
+    documents = []
+    for name in ("a.docx", "b.docx"):
+        document = tmp_path / name
+        document.write_bytes(name.encode("utf-8"))
+        documents.append(document)
+
+    payloads = [file_service.generate_cached_thumbnail_bytes(document, "word", (96, 96)) for document in documents]
+    cache_paths = [file_service._thumbnail_cache_path(document, "word", 96, 96) for document in documents]
+
+    assert payloads[0] == payloads[1] == file_service.generate_placeholder_thumbnail_bytes("word", (96, 96))
+    assert cache_paths[0] != cache_paths[1]
+    assert os.path.samefile(cache_paths[0], cache_paths[1])
+    assert file_service._read_cached_thumbnail(cache_paths[1], 600) == payloads[0]
+    assert list(cache_root.rglob("*.tmp")) == []
+
+
+def test_placeholder_links_keep_their_own_age(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from stream_server.services import file_service
+
+    monkeypatch.setenv("STREAM_THUMBNAIL_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("STREAM_THUMBNAIL_CACHE_TTL_SECONDS", "600")
+    file_service._thumbnail_memory_cache.clear()
+    documents = []
+    for name in ("a.docx", "b.docx"):
+        document = tmp_path / name
+        document.write_bytes(name.encode("utf-8"))
+        documents.append(document)
+
+    file_service.generate_cached_thumbnail_bytes(documents[0], "word", (96, 96))
+    first_path = file_service._thumbnail_cache_path(documents[0], "word", 96, 96)
+    aged = time.time() - 400
+    os.utime(first_path, (aged, aged))
+    first_mtime_ns = first_path.stat().st_mtime_ns
+
+    for _ in range(3):
+        file_service.generate_cached_thumbnail_bytes(documents[1], "word", (96, 96))
+        second_path = file_service._thumbnail_cache_path(documents[1], "word", 96, 96)
+        assert file_service._read_cached_thumbnail(first_path, 600) is not None
+
+    # A shared copy past half the TTL is replaced rather than refreshed: the older link keeps its age
+    # and the memory LRU holds one entry for it, however many links are made afterwards.
+    assert not os.path.samefile(first_path, second_path)
+    assert first_path.stat().st_mtime_ns == first_mtime_ns
+    first_keys = [key for key in file_service._thumbnail_memory_cache._entries if key[1] == str(first_path)]
+    assert len(first_keys) == 1
+    assert file_service._read_cached_thumbnail(first_path, 300) is None
+
+
+def test_disk_cached_thumbnails_are_held_in_memory_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from stream_server.services import file_service
+
+    monkeypatch.setenv("STREAM_THUMBNAIL_CACHE_DIR", str(tmp_path / "cache"))
+    file_service._thumbnail_memory_cache.clear()
+    source = tmp_path / "a.py"
+    source.write_text("print('hello')\n", encoding="utf-8")
+    directories = [tmp_path / "d1", tmp_path / "d2"]
+    for directory in directories:
+        directory.mkdir()
+
+    for _ in range(3):
+        code = file_service.generate_cached_thumbnail_bytes(source, "code", (96, 96))
+        for directory in directories:
+            folder = file_service.generate_cached_thumbnail_bytes(directory, "directory", (96, 96))
+
+    # Per file, only the disk read of a.py is held; the directory links share the one placeholder entry
+    # for their type and size, and no payload is held twice.
+    entries = file_service._thumbnail_memory_cache._entries
+    per_file = [key for key in entries if key[0] != "_placeholder_thumbnail_cache"]
+    cache_path = file_service._thumbnail_cache_path(source, "code", 96, 96)
+    assert [key[:2] for key in per_file] == [("_read_cached_thumbnail", str(cache_path))]
+    assert len(set(entries.values())) == len(entries)
+    assert code in entries.values()
+    assert folder == file_service.generate_placeholder_thumbnail_bytes("directory", (96, 96))
+
+
+def test_walk_sorted_entries_matches_os_walk_order(tmp_path: Path) -> None:
+    for relative in ("b/z", "b/a/deep", "A/x", "c", "a2/y/z"):
+        (tmp_path / relative).mkdir(parents=True)
+        (tmp_path / relative / "file.txt").write_text("x", encoding="utf-8")
+
+    expected = []
+    for directory, dirnames, _filenames in os.walk(tmp_path):
+        dirnames.sort(key=str.casefold)
+        expected.append(directory)
+
+    walked = [directory for directory, _dirs, _files in file_service_catalog._walk_sorted_entries(tmp_path)]
+    assert walked == expected
+
+    walker = file_service_catalog._walk_sorted_entries(tmp_path)
+    next(walker)
+    walker.close()
+
+
+def test_list_directory_caches_rows_and_builds_fresh_dicts(tmp_path: Path) -> None:
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "clip.mp4").write_bytes(b"12345")
+    file_service_catalog._cached_directory_entries.cache_clear()
+
+    first = file_service_catalog.list_directory(tmp_path, tmp_path)["items"]
+    first[0]["name"] = "mutated"
+    second = file_service_catalog.list_directory(tmp_path, tmp_path)["items"]
+
+    assert [list(item) for item in second] == [list(file_service_catalog._LISTING_FIELDS)] * 2
+    assert (second[0]["name"], second[0]["type"]) == ("sub", "directory")
+    assert (second[1]["name"], second[1]["path"], second[1]["size"]) == ("clip.mp4", "clip.mp4", 5)
+    _current, _parent, rows = file_service_catalog._cached_directory_entries.__wrapped__(str(tmp_path), str(tmp_path), 0)
+    assert all(type(row) is tuple for row in rows)
+
+
+def test_list_directory_reads_entry_metadata_from_scandir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (tmp_path / name).write_text(name, encoding="utf-8")
+    file_service_catalog._cached_directory_entries.cache_clear()
+
+    stat_calls: list[Path] = []
+    original_stat = Path.stat
+
+    def counting_stat(self: Path, *args, **kwargs):
+        stat_calls.append(self)
+        return original_stat(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "stat", counting_stat)
+    items = file_service_catalog.list_directory(tmp_path, tmp_path)["items"]
+
+    assert [item["size"] for item in items] == [5, 5, 5]
+    assert all(path.name not in {"a.txt", "b.txt", "c.txt"} for path in stat_calls)
+
+
+def test_agent_listing_builds_child_paths_without_resolving(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ALLOW_INSECURE_DEFAULTS", "1")
+    agent_files = importlib.import_module("agent.services.file_service")
+
+    root = tmp_path / "share"
+    (root / "sub").mkdir(parents=True)
+    (root / "sub" / "notes.md").write_text("x", encoding="utf-8")
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (root / "sub" / "escape").symlink_to(outside)
+    (root / "sub" / "alias.md").symlink_to(root / "sub" / "notes.md")
+
+    resolve_calls: list[Path] = []
+    original_resolve = Path.resolve
+
+    def counting_resolve(self: Path, *args, **kwargs):
+        resolve_calls.append(self)
+        return original_resolve(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "resolve", counting_resolve)
+    _current, _parent, truncated, items = agent_files._compute_directory_listing(root, root / "sub", 10)
+
+    assert not truncated
+    assert [(item["name"], item["path"], item["parent_path"], item["type"]) for item in items] == [
+        ("alias.md", "sub/notes.md", "sub", "markdown"),
+        ("notes.md", "sub/notes.md", "sub", "markdown"),
+    ]
+    assert all(path.name != "notes.md" for path in resolve_calls)
+    assert [item["size"] for item in items] == [1, 1]
+    assert items[1]["modified_at"] == (root / "sub" / "notes.md").stat().st_mtime
+
+
+def test_agent_search_walk_matches_os_walk_order(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ALLOW_INSECURE_DEFAULTS", "1")
+    agent_files = importlib.import_module("agent.services.file_service")
+
+    for relative in ("b/z", "b/a/deep", "A/x", "c"):
+        (tmp_path / relative).mkdir(parents=True)
+        (tmp_path / relative / "file.txt").write_text("x", encoding="utf-8")
+    (tmp_path / "c" / "loop").symlink_to(tmp_path / "b")
+
+    expected = []
+    for directory, dirnames, _filenames in os.walk(tmp_path):
+        dirnames.sort(key=str.casefold)
+        expected.append(directory)
+
+    walked = [directory for directory, _dirs, _files in agent_files._walk_sorted_entries(tmp_path)]
+    assert walked == expected
+
+    result = agent_files.search_entries(tmp_path, tmp_path, "file", max_results=100)
+    assert [item["path"] for item in result["items"]] == [f"{relative}/file.txt" for relative in ("A/x", "b/a/deep", "b/z", "c")]
+
+
+def test_agent_listing_truncates_in_sorted_order(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ALLOW_INSECURE_DEFAULTS", "1")
+    agent_files = importlib.import_module("agent.services.file_service")
+
+    names = [f"File{index:02d}.txt" for index in range(30)]
+    for name in reversed(names):
+        (tmp_path / name).write_text("x", encoding="utf-8")
+    (tmp_path / "zdir").mkdir()
+
+    for limit in (3, 20):
+        _current, _parent, truncated, items = agent_files._compute_directory_listing(tmp_path, tmp_path, limit)
+        assert truncated
+        assert [item["name"] for item in items] == ["zdir", *names[: limit - 1]]
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+import time
 from pathlib import Path
 
+import pytest
 from flask import Flask
 
 import app as launcher
@@ -61,52 +64,32 @@ def test_discover_coordinators_probes_seed_then_scan(monkeypatch) -> None:
     assert calls[1] == ["http://192.168.1.50:7000/"]
 
 
-def test_probe_coordinator_urls_cancels_leftover_futures(monkeypatch) -> None:
-    created_futures = []
-    shutdown_calls = []
+def test_probe_coordinator_urls_stops_after_enough_results(monkeypatch) -> None:
+    probed: list[str] = []
 
-    class FakeFuture:
-        def __init__(self, value: str | None) -> None:
-            self.value = value
-            self.cancelled = False
-            self._done = False
+    async def fake_port_open(host: str, port: int, timeout_seconds: float) -> bool:
+        if host == "slow":
+            await asyncio.sleep(30)
+        return host != "closed"
 
-        def result(self):
-            self._done = True
-            return self.value
+    def fake_probe(url: str, timeout_seconds: float) -> str | None:
+        probed.append(url)
+        return url.rstrip("/")
 
-        def done(self) -> bool:
-            return self._done
-
-        def cancel(self) -> None:
-            self.cancelled = True
-
-    class FakeExecutor:
-        def __init__(self, max_workers: int) -> None:
-            self.max_workers = max_workers
-
-        def submit(self, _fn, url, _timeout_seconds):
-            value = url.rstrip("/") if "hit" in url else None
-            future = FakeFuture(value)
-            created_futures.append(future)
-            return future
-
-        def shutdown(self, *, wait: bool = True, cancel_futures: bool = False) -> None:
-            shutdown_calls.append((wait, cancel_futures))
-
-    monkeypatch.setattr(networking, "ThreadPoolExecutor", FakeExecutor)
-    monkeypatch.setattr(networking, "as_completed", lambda futures: iter(list(futures)))
+    monkeypatch.setattr(networking, "_tcp_port_open", fake_port_open)
+    monkeypatch.setattr(networking, "_coordinator_probe", fake_probe)
 
+    started = time.monotonic()
     result = networking._probe_coordinator_urls(
-        ["http://hit:7000/", "http://slow:7000/"],
+        ["http://closed:7000/", "http://hit:7000/", "http://slow:7000/"],
         timeout_seconds=0.1,
         max_workers=8,
         max_results=1,
     )
 
     assert result == ["http://hit:7000"]
-    assert created_futures[1].cancelled
-    assert shutdown_calls == [(False, True)]
+    assert probed == ["http://hit:7000/"]
+    assert time.monotonic() - started < 5
 
 
 def test_coordinator_discovery_hosts_respects_include_exclude_cidrs(monkeypatch) -> None:
@@ -283,6 +266,22 @@ def test_transfer_create_request_allows_up_to_200_items() -> None:
     assert len(payload.items) == 200
 
 
+def test_passcode_requests_require_exactly_four_digits() -> None:
+    from pydantic import ValidationError
+
+    from shared.schemas import PasscodeOpenRequest, TransferApproveRequest
+
+    assert PasscodeOpenRequest(passcode="0420").passcode == "0420"
+    assert TransferApproveRequest(passcode="1234", destination_path="inbox").destination_path == "inbox"
+    for invalid in ("123", "12345", "12a4", "1234\n"):
+        with pytest.raises(ValidationError):
+            PasscodeOpenRequest(passcode=invalid)
+
+    trusted = TransferApproveRequest.from_trusted(passcode="9999")
+    assert trusted.passcode == "9999"
+    assert trusted.destination_path == ""
+
+
 def test_coordinator_default_transfer_ticket_ttl_is_extended(monkeypatch) -> None:
     monkeypatch.setenv("ALLOW_INSECURE_DEFAULTS", "1")
     monkeypatch.delenv("COORDINATOR_TRANSFER_TICKET_TTL", raising=False)
@@ -309,3 +308,22 @@ def test_coordinator_browse_pin_defaults_to_stream_pin(monkeypatch) -> None:
 
     config = load_config()
     assert config.browse_access_pin == "246810"
+
+
+def test_collect_candidate_ipv4_reuses_recent_probe(monkeypatch) -> None:
+    calls: list[int] = []
+
+    def fake_probe() -> list[str]:
+        calls.append(1)
+        return ["192.168.1.20"]
+
+    monkeypatch.setattr(networking, "_probe_candidate_ipv4", fake_probe)
+    monkeypatch.setattr(networking, "_candidate_ipv4_cache", None)
+
+    assert networking._collect_candidate_ipv4() == ["192.168.1.20"]
+    assert networking._collect_candidate_ipv4() == ["192.168.1.20"]
+    assert len(calls) == 1
+
+    monkeypatch.setattr(networking, "_CANDIDATE_IPV4_TTL_SECONDS", 0.0)
+    networking._collect_candidate_ipv4()
+    assert len(calls) == 2